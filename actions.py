@@ -4,11 +4,12 @@ import random
 from typing import Optional, Tuple, TYPE_CHECKING
 
 import exceptions
-from constants import colors
+from constants import colors, general
+from entity import Item
 
 if TYPE_CHECKING:
     from engine import Engine
-    from entity import Actor, Entity, Item
+    from entity import Actor, Entity
 
 
 class Action:
@@ -28,8 +29,31 @@ class Action:
 
         `self.entity` is the object performing the action
 
-        This method must be overridden by Action subclasses
+        Raises ImpossibleAction with the reason from `validate` if it can't be performed, otherwise calls `execute`.
+        Action subclasses override either this method, or `validate` and `execute`
         """
+        reason = self.validate()
+        if reason is not None:
+            raise exceptions.ImpossibleAction(reason)
+        return self.execute()
+
+    def try_perform(self) -> bool:
+        """Perform this action if it's possible, otherwise return False instead of raising ImpossibleAction
+
+        Meant for monsters, which fail routinely (like stumbling into a wall) and have nobody to show the reason to,
+        so a crowded turn doesn't pay for raising and catching an exception per blocked monster
+        Only for actions that implement `validate` and `execute`
+        """
+        if self.validate() is not None:
+            return False
+        return self.execute()
+
+    def validate(self) -> Optional[str]:
+        """Return the reason this action can't be performed right now, or None if it can"""
+        return None
+
+    def execute(self) -> bool:
+        """Carry out this action, which `validate` has already allowed"""
         raise NotImplementedError()
 
 
@@ -47,12 +71,14 @@ class PickupAction(Action):
         if not inventory:
             return
 
-        for item in self.engine.game_map.items:
-            if actor_location_x == item.x and actor_location_y == item.y:
+        for item in self.engine.game_map.get_entities_at_location(
+            actor_location_x, actor_location_y
+        ):
+            if isinstance(item, Item):
                 if len(inventory.filtered_items) >= inventory.capacity:
                     raise exceptions.ImpossibleAction("Your inventory is full")
 
-                self.engine.game_map.entities.remove(item)
+                self.engine.game_map.remove_entity(item)
                 item.parent = self.entity.inventory
                 inventory.items.append(item)
 
@@ -108,15 +134,29 @@ class EquipAction(Action):
 
 
 class WaitAction(Action):
-    def perform(self) -> bool:
+    def execute(self) -> bool:
         return True
 
 
 class StairsUpAction(Action):
     def perform(self) -> bool:
-        self.engine.message_log.add_message(
-            "Sunlight and the village tempt you, but duty calls", fg=colors.welcome_text
-        )
+        """
+        Take the stairs up back to the previous floor, if the entity is on them
+        """
+        if (self.entity.x, self.entity.y) != self.engine.game_map.upstairs_location:
+            raise exceptions.ImpossibleAction("There are no stairs up here")
+
+        game_world = self.engine.game_world
+        if game_world.current_floor <= 1:
+            self.engine.message_log.add_message(
+                "Sunlight and the village tempt you, but duty calls",
+                fg=colors.welcome_text,
+            )
+        else:
+            game_world.go_to_floor(game_world.current_floor - 1)
+            self.engine.message_log.add_message(
+                "You climb the creaky staircase", colors.welcome_text
+            )
         return False
 
 
@@ -126,11 +166,13 @@ class TakeStairsAction(Action):
         Take the stairs, if any exist at the entity's location
         """
         if (self.entity.x, self.entity.y) == self.engine.game_map.downstairs_location:
-            self.engine.game_world.generate_floor()
+            game_world = self.engine.game_world
+            game_world.go_to_floor(game_world.current_floor + 1)
             self.engine.message_log.add_message(
                 "You descend the creaky staircase", colors.welcome_text
             )
-        # TTODO Stairs up done here
+        elif (self.entity.x, self.entity.y) == self.engine.game_map.upstairs_location:
+            StairsUpAction(self.entity).perform()
         else:
             raise exceptions.ImpossibleAction("There are no stairs here")
 
@@ -156,9 +198,6 @@ class ActionWithDirection(Action):
         """Return the actor at this actions destination"""
         return self.engine.game_map.get_actor_at_location(*self.dest_xy)
 
-    def perform(self) -> bool:
-        raise NotImplementedError()
-
 
 class MeleeAction(ActionWithDirection):
     def __init__(
@@ -168,10 +207,13 @@ class MeleeAction(ActionWithDirection):
 
         self.override_damage = override_damage if override_damage else None
 
-    def perform(self) -> bool:
+    def validate(self) -> Optional[str]:
+        if not self.target_actor:
+            return "Nothing to attack"
+        return None
+
+    def execute(self) -> bool:
         target = self.target_actor
-        if not target:
-            raise exceptions.ImpossibleAction("Nothing to attack")
 
         # Randomize damage if we have a range
         base_power_calc = (
@@ -199,6 +241,11 @@ class MeleeAction(ActionWithDirection):
             self.engine.message_log.add_message(
                 f"{attack_desc} but does no damage", attack_color
             )
+
+        if self.engine.player in (self.entity, target):
+            self.engine.game_map.make_noise(
+                target.x, target.y, general.COMBAT_NOISE_RADIUS
+            )
         return True
 
 
@@ -208,29 +255,47 @@ class MovementAction(ActionWithDirection):
     # y = int(state[tcod.event.Scancode.S]) - int(state[tcod.event.Scancode.W])
     # print(f"X AND Y on movement {x} and {y}")
 
-    def perform(self) -> bool:
+    def validate(self) -> Optional[str]:
         dest_x, dest_y = self.dest_xy
+        game_map = self.engine.game_map
 
-        if not self.engine.game_map.in_bounds(dest_x, dest_y):
-            raise exceptions.ImpossibleAction("That way is blocked")
-        if not self.engine.game_map.tiles["walkable"][dest_x, dest_y]:
-            raise exceptions.ImpossibleAction("That way is blocked")
-        if self.engine.game_map.get_blocking_entity_at_location(dest_x, dest_y):
-            raise exceptions.ImpossibleAction("That way is blocked")
+        if (
+            not game_map.in_bounds(dest_x, dest_y)
+            or not game_map.tile_at(dest_x, dest_y)["walkable"]
+            or game_map.get_blocking_entity_at_location(dest_x, dest_y)
+        ):
+            return "That way is blocked"
+        return None
 
+    def execute(self) -> bool:
         self.entity.move(self.dx, self.dy)
         return True
 
 
 class BumpAction(ActionWithDirection):
-    def perform(self) -> bool:
-        if self.target_actor:
-            return MeleeAction(self.entity, self.dx, self.dy).perform()
-        else:
-            match_entity = self.engine.game_map.get_entity_at_location(*self.dest_xy)
-
-            # TODO Better way to detect "Stairs up", perhaps an Entity type, or new child class besides Actor
-            if getattr(match_entity, "name", None) == "Stairs up":
-                StairsUpAction(self.entity).perform()
+    """Attack the actor in the given direction if there is one, otherwise move that way"""
 
-            return MovementAction(self.entity, self.dx, self.dy).perform()
+    def resolve(self) -> ActionWithDirection:
+        """Return the action this bump turns into"""
+        if self.target_actor:
+            return MeleeAction(self.entity, self.dx, self.dy)
+        return MovementAction(self.entity, self.dx, self.dy)
+
+    def validate(self) -> Optional[str]:
+        return self.resolve().validate()
+
+    def execute(self) -> bool:
+        # Resolved again, in case the map changed since it was validated
+        action = self.resolve()
+        result = action.execute()
+
+        # Stepping onto the stairs up of the first floor is as close as the player gets to leaving
+        if (
+            isinstance(action, MovementAction)
+            and self.entity is self.engine.player
+            and (self.entity.x, self.entity.y) == self.engine.game_map.upstairs_location
+            and self.engine.game_world.current_floor <= 1
+        ):
+            StairsUpAction(self.entity).perform()
+
+        return result
@@ -0,0 +1,144 @@
+"""Struct-of-arrays storage for the actors on a GameMap, so area effects and distance checks can be vectorized"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, TYPE_CHECKING
+
+import numpy as np  # type: ignore
+
+if TYPE_CHECKING:
+    from entity import Actor
+
+# Name and dtype of each column, one row per actor
+COLUMNS = {
+    "x": np.int32,
+    "y": np.int32,
+    "hp": np.int32,
+    "max_hp": np.int32,
+    "base_power": np.int32,
+    "base_defense": np.int32,
+    "alive": np.bool_,
+}
+# Columns that a Fighter reads and writes through while its actor is in a table
+FIGHTER_COLUMNS = ("hp", "max_hp", "base_power", "base_defense")
+
+INITIAL_CAPACITY = 64
+
+
+class TableColumn:
+    """An attribute that lives in an ActorTable row while its owner is attached to a table, and on the object otherwise
+
+    The owner needs "_table" and "_table_slot" attributes. The value is stored under the attribute's own name in the
+    instance __dict__ while detached, so objects pickled before the table existed still load
+    """
+
+    def __init__(self, column: str):
+        self.column = column
+        self.name = column
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj: Any, objtype: Optional[type] = None) -> Any:
+        if obj is None:
+            return self
+        table = obj._table
+        if table is None:
+            return obj.__dict__[self.name]
+        return table.columns[self.column][obj._table_slot].item()
+
+    def __set__(self, obj: Any, value: int) -> None:
+        table = obj._table
+        if table is None:
+            obj.__dict__[self.name] = value
+        else:
+            table.columns[self.column][obj._table_slot] = value
+
+
+def detached_state(obj: Any) -> Dict[str, Any]:
+    """Return a copy of an object's __dict__ as if it weren't attached to a table, for pickling and copying"""
+    state = obj.__dict__.copy()
+    if obj._table is not None:
+        for attribute in vars(type(obj)).values():
+            if isinstance(attribute, TableColumn):
+                state[attribute.name] = attribute.__get__(obj)
+    state["_table"] = None
+    state["_table_slot"] = 0
+    return state
+
+
+class ActorTable:
+    """Holds the position and combat stats of every actor on a map as NumPy columns
+
+    While an actor is in the table its Fighter stats live here, and the Fighter is just a view into its row
+    Positions are kept in sync by the GameMap, as every move already goes through it
+    """
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(INITIAL_CAPACITY, dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        self.actors: List[Optional[Actor]] = [None] * INITIAL_CAPACITY
+        self._free_slots: List[int] = list(reversed(range(INITIAL_CAPACITY)))
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # Allow table.hp instead of table.columns["hp"]
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def capacity(self) -> int:
+        return len(self.actors)
+
+    def add(self, actor: Actor) -> None:
+        """Give an actor a row, and make its Fighter a view into it"""
+        if not self._free_slots:
+            self._grow()
+        slot = self._free_slots.pop()
+
+        fighter = actor.fighter
+        row: Dict[str, Any] = {name: getattr(fighter, name) for name in FIGHTER_COLUMNS}
+        row.update(x=actor.x, y=actor.y, alive=actor.is_alive)
+        for name, value in row.items():
+            self.columns[name][slot] = value
+
+        self.actors[slot] = actor
+        fighter.attach_to_table(self, slot)
+
+    def remove(self, actor: Actor) -> None:
+        """Copy the actor's stats back into its Fighter, and free its row"""
+        slot = actor.fighter.table_slot
+        actor.fighter.detach_from_table()
+        self.actors[slot] = None
+        self.columns["alive"][slot] = False
+        self._free_slots.append(slot)
+
+    def move(self, actor: Actor) -> None:
+        """Update the stored position of an actor after it moved"""
+        slot = actor.fighter.table_slot
+        self.columns["x"][slot] = actor.x
+        self.columns["y"][slot] = actor.y
+
+    def mark_dead(self, actor: Actor) -> None:
+        self.columns["alive"][actor.fighter.table_slot] = False
+
+    def living_slots(self) -> np.ndarray:
+        """Return the rows of every living actor"""
+        return np.flatnonzero(self.columns["alive"])
+
+    def living_actors(self) -> Iterator[Actor]:
+        for slot in self.living_slots():
+            if self.columns["alive"][slot]:  # Skip any that died while iterating
+                yield self.actors[slot]
+
+    def _grow(self) -> None:
+        old_capacity = self.capacity
+        for name, column in self.columns.items():
+            self.columns[name] = np.concatenate(
+                [column, np.zeros(old_capacity, dtype=column.dtype)]
+            )
+        self.actors.extend([None] * old_capacity)
+        self._free_slots.extend(reversed(range(old_capacity, old_capacity * 2)))
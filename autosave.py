@@ -0,0 +1,98 @@
+"""Periodically save the game on a background thread, so a crash or power cut doesn't lose the whole run"""
+
+from __future__ import annotations
+
+import threading
+import traceback
+from typing import Optional, TYPE_CHECKING
+
+import savefile
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+
+class Autosaver:
+    """Snapshots the game between turns, then compresses and writes it on a worker thread
+
+    Only the newest snapshot is kept, if the worker is still busy with an older one
+    """
+
+    def __init__(self, filename: str, every_n_turns: int):
+        self.filename = filename
+        self.every_n_turns = every_n_turns
+
+        self._engine: Optional[Engine] = None
+        self._last_saved_turn = 0
+        self._last_saved_floor = 0
+
+        self._condition = threading.Condition()
+        self._pending: Optional[savefile.SaveSnapshot] = None
+        self._writing = False
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def on_turn_boundary(self, engine: Engine) -> None:
+        """Called between turns, autosaves if the player took the stairs or enough turns have passed"""
+        if engine is not self._engine:
+            # A newly started or loaded game, which doesn't need saving right away
+            self._engine = engine
+            self._last_saved_turn = engine.turn_count
+            self._last_saved_floor = engine.game_world.current_floor
+            return
+
+        if not engine.player.is_alive:
+            # Let any save underway finish now, before the game over screen deletes the save file
+            self.wait()
+            return
+
+        if (
+            engine.game_world.current_floor != self._last_saved_floor
+            or engine.turn_count - self._last_saved_turn >= self.every_n_turns
+        ):
+            self._last_saved_turn = engine.turn_count
+            self._last_saved_floor = engine.game_world.current_floor
+            # Taking a snapshot can move the files kept alongside the save, so the previous save has to land first
+            self.wait()
+            snapshot = savefile.take_snapshot(engine, self.filename)
+
+            with self._condition:
+                # Replaces an older snapshot that was never written
+                self._pending = snapshot
+                self._condition.notify_all()
+
+    def wait(self) -> None:
+        """Block until every requested autosave has been written, or thrown away if it's a dead game"""
+        with self._condition:
+            if self._engine is not None and not self._engine.player.is_alive:
+                self._pending = None
+            while self._pending is not None or self._writing:
+                self._condition.wait()
+
+    def stop(self) -> None:
+        """Finish any autosave underway, then shut down the worker thread"""
+        self.wait()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._pending is None:
+                    return  # Stopping, and nothing left to write
+                snapshot, self._pending = self._pending, None
+                self._writing = True
+
+            try:
+                savefile.write_snapshot(snapshot, self.filename)
+            except Exception:
+                traceback.print_exc()  # A failed autosave shouldn't take the game down with it
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Run the game headlessly (no SDL window) and report how fast the turn loop is
+
+Example: python benchmark.py --turns 5000 --seed 42 --god-mode --descend-every 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional
+
+import actions
+import input_handlers
+import prefetch
+import setup_game
+from actions import Action
+from constants import general
+from engine import Engine
+from exceptions import ImpossibleAction
+
+DIRECTIONS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+class TimedCalls:
+    """Accumulates how long and how often the wrapped functions took"""
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.calls[name] += 1
+
+        return timed
+
+
+def random_actions(engine: Engine, descend_every: int) -> Iterator[Action]:
+    """Endless stream of random player actions, mostly moving and attacking"""
+    turn = 0
+    while True:
+        turn += 1
+        player = engine.player
+        if descend_every and turn % descend_every == 0:
+            # Teleport onto the stairs, so floor generation is part of the benchmark
+            player.place(*engine.game_map.downstairs_location)
+            yield actions.TakeStairsAction(player)
+            continue
+
+        roll = random.random()
+        if roll < 0.05:
+            yield actions.WaitAction(player)
+        elif roll < 0.08:
+            yield actions.PickupAction(player)
+        else:
+            yield actions.BumpAction(player, *random.choice(DIRECTIONS))
+
+
+def scripted_actions(engine: Engine, filename: str) -> Iterator[Action]:
+    """Stream of player actions read from a file, one per line, repeated until the run ends
+
+    Supported lines are "move <dx> <dy>", "wait", "pickup" and "stairs", blank lines and # comments are ignored
+    """
+    with open(filename) as f:
+        lines = [line.split("#")[0].split() for line in f]
+    lines = [line for line in lines if line]
+    if not lines:
+        raise ValueError(f"No actions found in {filename}")
+
+    while True:
+        for command, *args in lines:
+            player = engine.player
+            if command == "move":
+                yield actions.BumpAction(player, int(args[0]), int(args[1]))
+            elif command == "wait":
+                yield actions.WaitAction(player)
+            elif command == "pickup":
+                yield actions.PickupAction(player)
+            elif command == "stairs":
+                yield actions.TakeStairsAction(player)
+            else:
+                raise ValueError(f"Unknown scripted action: {command}")
+
+
+def run(
+    turns: int,
+    seed: Optional[int] = None,
+    script: Optional[str] = None,
+    god_mode: bool = False,
+    descend_every: int = 0,
+    trace_memory: bool = True,
+) -> None:
+    random.seed(seed)
+    if trace_memory:
+        tracemalloc.start()
+
+    timings = TimedCalls()
+    start = time.perf_counter()
+    engine = setup_game.new_game()
+    setup_seconds = time.perf_counter() - start
+
+    # Wrap the interesting parts of the turn loop on this engine only
+    engine.handle_enemy_turns = timings.wrap(
+        "handle_enemy_turns", engine.handle_enemy_turns
+    )
+    engine.update_fov = timings.wrap("update_fov", engine.update_fov)
+    engine.game_world.generate_floor = timings.wrap(
+        "generate_floor", engine.game_world.generate_floor
+    )
+
+    if god_mode:
+        engine.player.fighter.max_hp = engine.player.fighter.hp = 10**9
+
+    handler = input_handlers.MainGameEventHandler(engine)
+    action_stream = (
+        scripted_actions(engine, script)
+        if script
+        else random_actions(engine, descend_every)
+    )
+
+    performed = impossible = 0
+    start = time.perf_counter()
+    for action in action_stream:
+        if performed + impossible >= turns or not engine.player.is_alive:
+            break
+        try:
+            if handler.handle_action(action):
+                performed += 1
+            else:
+                impossible += 1
+        except ImpossibleAction:
+            impossible += 1
+    elapsed = time.perf_counter() - start
+
+    if trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    report: List[str] = [
+        f"Setup (new_game):    {setup_seconds * 1000:.1f} ms",
+        f"Actions attempted:   {performed + impossible} ({performed} took a turn, {impossible} didn't)",
+        f"Elapsed:             {elapsed:.3f} s",
+        f"Turns/second:        {performed / elapsed if elapsed else 0:.1f}",
+    ]
+    for name in ("handle_enemy_turns", "update_fov", "generate_floor"):
+        seconds = timings.seconds[name]
+        calls = timings.calls[name]
+        report.append(
+            f"{name + ':':<21}{seconds * 1000:.1f} ms over {calls} calls"
+            f" ({seconds / calls * 1000 if calls else 0:.3f} ms avg, {seconds / elapsed * 100 if elapsed else 0:.1f}%)"
+        )
+    if trace_memory:
+        report.append(f"Peak memory:         {peak_memory / 1024 / 1024:.2f} MiB")
+    report.append(
+        f"Ended on floor {engine.game_world.current_floor} with {len(engine.game_map.entities)} entities"
+        f"{'' if engine.player.is_alive else ', the player died'}"
+    )
+
+    print("\n".join(report))
+    prefetch.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--turns", type=int, default=1000, help="Number of actions to attempt"
+    )
+    parser.add_argument("--seed", type=int, help="Seed for the random module")
+    parser.add_argument(
+        "--script", help="File of actions to play instead of random ones"
+    )
+    parser.add_argument(
+        "--god-mode",
+        action="store_true",
+        help="Give the player effectively infinite HP so the run isn't cut short",
+    )
+    parser.add_argument(
+        "--descend-every",
+        type=int,
+        default=0,
+        help="Take the stairs every N random actions, to include floor generation",
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Don't trace peak memory, which slows down everything else",
+    )
+    args = parser.parse_args()
+
+    # Anything the game writes, like the message journal or floor store, stays out of the way and is cleaned up after
+    with tempfile.TemporaryDirectory(prefix="into_the_dark_benchmark_") as directory:
+        general.SAVE_FILE = os.path.join(directory, general.SAVE_FILE)
+        general.MESSAGE_JOURNAL_FILE = os.path.join(
+            directory, general.MESSAGE_JOURNAL_FILE
+        )
+        general.FLOOR_STORE_FILE = os.path.join(directory, general.FLOOR_STORE_FILE)
+        run(
+            turns=args.turns,
+            seed=args.seed,
+            script=args.script,
+            god_mode=args.god_mode,
+            descend_every=args.descend_every,
+            trace_memory=not args.no_memory,
+        )
+
+
+if __name__ == "__main__":
+    main()
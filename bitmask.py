@@ -0,0 +1,88 @@
+"""A true/false value for every tile of a map, packed eight tiles to a byte"""
+
+from __future__ import annotations
+
+from typing import Any, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+
+class BitMask:
+    """A boolean array of the map's (width, height), such as which tiles are visible or explored
+
+    Indexed like the boolean array it replaces, as long as the index is one of:
+    - An (x, y) location, or arrays of x and y locations, which return the bools at those locations
+    - A (slice, slice) window of the map, which returns (or is assigned) a boolean array of that window
+
+    Each column of the map is packed along y into the "bits" array, which is kept in Fortran order like every other
+    map array so it can be saved and loaded as raw bytes
+    """
+
+    def __init__(self, width: int, height: int, bits: Optional[np.ndarray] = None):
+        self.width, self.height = width, height
+        if bits is None:
+            bits = np.zeros((width, (height + 7) // 8), dtype=np.uint8)
+        self.bits = np.asfortranarray(bits, dtype=np.uint8)
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> BitMask:
+        """Pack a boolean array of the map's shape"""
+        width, height = np.shape(array)
+        return cls(width, height, np.packbits(array, axis=1))
+
+    def to_array(self) -> np.ndarray:
+        """Unpack the whole mask into a boolean array, which is slow for a large map"""
+        return np.asfortranarray(
+            np.unpackbits(self.bits, axis=1, count=self.height).astype(bool)
+        )
+
+    def __getitem__(self, key: Any) -> Any:
+        xs, ys = self._normalize_key(key)
+        if isinstance(ys, slice):
+            first_byte, last_byte, offset = self._byte_span(ys)
+            unpacked = np.unpackbits(self.bits[xs, first_byte:last_byte], axis=1)
+            return unpacked[:, offset : offset + ys.stop - ys.start].astype(bool)
+
+        # The bit for each location is counted from the most significant end of its byte
+        return ((self.bits[xs, ys >> 3] >> (7 - (ys & 7))) & 1).astype(bool)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        """Set a window of the mask to a boolean array of the same shape, or a single bool for all of it"""
+        xs, ys = self._normalize_key(key)
+        first_byte, last_byte, offset = self._byte_span(ys)
+        if offset == 0 and (ys.stop % 8 == 0 or ys.stop == self.height):
+            # The window starts and ends on whole bytes, so there's nothing around it to keep
+            unpacked = np.zeros(
+                (len(range(self.width)[xs]), (last_byte - first_byte) * 8), dtype=bool
+            )
+        else:
+            unpacked = np.unpackbits(self.bits[xs, first_byte:last_byte], axis=1)
+        unpacked[:, offset : offset + ys.stop - ys.start] = value
+        self.bits[xs, first_byte:last_byte] = np.packbits(unpacked, axis=1)
+
+    def merge(self, key: Any, value: np.ndarray) -> None:
+        """Set every location in a window that's True in the boolean array `value`, like `mask[window] |= value`
+
+        Only the new values are packed, then OR'd straight into the existing bytes
+        """
+        xs, ys = self._normalize_key(key)
+        first_byte, last_byte, offset = self._byte_span(ys)
+        padded = np.zeros(
+            (np.shape(value)[0], (last_byte - first_byte) * 8), dtype=bool
+        )
+        padded[:, offset : offset + ys.stop - ys.start] = value
+        self.bits[xs, first_byte:last_byte] |= np.packbits(padded, axis=1)
+
+    def _normalize_key(self, key: Any) -> Tuple[Any, Any]:
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        xs, ys = key
+        if isinstance(ys, slice):
+            start, stop, _ = ys.indices(self.height)
+            ys = slice(start, max(start, stop))
+        return xs, ys
+
+    @staticmethod
+    def _byte_span(ys: slice) -> Tuple[int, int, int]:
+        """Return the bytes a window of y values is packed in, and how many bits into the first byte it starts"""
+        return ys.start // 8, (ys.stop + 7) // 8, ys.start % 8
@@ -0,0 +1,56 @@
+"""Which part of the map is shown on screen, for maps bigger than the console"""
+
+from __future__ import annotations
+
+from typing import Tuple
+
+from constants import general
+
+
+class Camera:
+    """The window of the map drawn in the viewport, kept centered on the player where the map allows
+
+    Maps that fit in the viewport are drawn from the top left corner as usual
+    Map coordinates are (x, y) on the GameMap, and screen coordinates are (x, y) on the console
+    """
+
+    def __init__(
+        self,
+        width: int = general.VIEWPORT_WIDTH,
+        height: int = general.VIEWPORT_HEIGHT,
+    ):
+        self.width, self.height = width, height
+        # The map coordinates of the top left of the viewport
+        self.x, self.y = 0, 0
+        # How much of the map is shown, which is less than the viewport on small maps
+        self.view_width, self.view_height = width, height
+
+    def follow(self, x: int, y: int, map_width: int, map_height: int) -> None:
+        """Center the camera on the given map location, without showing past the edges of the map"""
+        self.view_width = min(self.width, map_width)
+        self.view_height = min(self.height, map_height)
+        self.x = max(0, min(x - self.width // 2, map_width - self.view_width))
+        self.y = max(0, min(y - self.height // 2, map_height - self.view_height))
+
+    @property
+    def window(self) -> Tuple[slice, slice]:
+        """The part of the map that is shown, as a 2D index into the map arrays"""
+        return (
+            slice(self.x, self.x + self.view_width),
+            slice(self.y, self.y + self.view_height),
+        )
+
+    def to_screen(self, x: int, y: int) -> Tuple[int, int]:
+        """Return where the given map location is drawn on the console"""
+        return x - self.x, y - self.y
+
+    def to_map(self, x: int, y: int) -> Tuple[int, int]:
+        """Return the map location drawn at the given console location"""
+        return x + self.x, y + self.y
+
+    def is_on_screen(self, x: int, y: int) -> bool:
+        """Return True if the given map location is in the part of the map that is shown"""
+        return (
+            self.x <= x < self.x + self.view_width
+            and self.y <= y < self.y + self.view_height
+        )
@@ -1,37 +1,44 @@
 from __future__ import annotations
 
+import copy
 import random
-from typing import List, Tuple, TYPE_CHECKING, Optional
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING, Optional
 
 import numpy as np  # type: ignore
 import tcod
 
 from actions import Action, MeleeAction, MovementAction, WaitAction, BumpAction
+from constants import general
 
 if TYPE_CHECKING:
     from entity import Actor
 
 
 class BaseAI(Action):
-    def perform(self) -> None:
+    def perform(self) -> bool:
+        """Take this actor's turn, returning whether it acted"""
         raise NotImplementedError()
 
+    def clone_for(self, entity: Actor) -> BaseAI:
+        """Return a copy of this AI for a new actor, see Entity.instantiate"""
+        clone = copy.copy(self)
+        clone.entity = entity
+        return clone
+
+    def is_idle(self) -> bool:
+        """Return True if this AI has nothing to do until something wakes it, see TurnScheduler"""
+        return False
+
+    def alert(self) -> None:
+        """Called when this actor hears a noise, such as a nearby fight"""
+        pass
+
     def get_path_to(self, dest_x: int, dest_y: int) -> List[Tuple[int, int]]:
         """Compute and return a path to the target position
 
         If there is no valid path then returns an empty list
         """
-        # Copy the walkable array
-        cost = np.array(self.entity.game_map.tiles["walkable"], dtype=np.int8)
-
-        for entity in self.entity.game_map.entities:
-            # Check that an enitiy blocks movement and the cost isn't zero (aka blocking)
-            if entity.blocks_movement and cost[entity.x, entity.y]:
-                # Add to the cost of a blocked position
-                # A lower number means more enemies will crowd behind each other in
-                # hallways. A higher number means enemies will take longer paths in
-                # order to surround the player.
-                cost[entity.x, entity.y] += 10
+        cost = self.entity.game_map.get_path_cost()
 
         # Create a graph from the cost array and pass that graph to a new pathfinder
         graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
@@ -45,12 +52,52 @@ class BaseAI(Action):
         # Convert from List[List[int]] to List[Tuple[int, int]]
         return [(index[0], index[1]) for index in path]
 
+    def get_path_to_player(self) -> List[Tuple[int, int]]:
+        """Compute and return a path to the player, using the distance map shared by all AIs
+
+        If there is no valid path then returns an empty list
+        """
+        distance = self.entity.game_map.get_player_distance()
+        if distance[self.entity.x, self.entity.y] == np.iinfo(distance.dtype).max:
+            return []  # The player can't be reached from here
+
+        # Walk downhill from our position to the player and remove the starting point
+        path: List[List[int]] = tcod.path.hillclimb2d(
+            distance, (self.entity.x, self.entity.y), cardinal=True, diagonal=True
+        )[1:].tolist()
+
+        return [(index[0], index[1]) for index in path]
+
 
 class HostileEnemy(BaseAI):
+    # The player's location and the map's blockers_version when `path` was last planned or repaired
+    _path_key: Optional[Tuple[Tuple[int, int], int]] = None
+
     def __init__(self, entity: Actor):
         super().__init__(entity)
         self.path: List[Tuple[int, int]] = []
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # A blockers_version means nothing to a map loaded from a save, so the path is planned again
+        state = self.__dict__.copy()
+        state.pop("_path_key", None)
+        return state
+
+    def clone_for(self, entity: Actor) -> HostileEnemy:
+        clone = super().clone_for(entity)
+        clone.path = list(self.path)
+        return clone
+
+    def is_idle(self) -> bool:
+        # Nothing to chase and nowhere to go, so waiting until the player shows up
+        return self.entity.last_seen_player <= 0 and not self.path
+
+    def alert(self) -> None:
+        # Come looking for the player, as if they were just seen
+        self.entity.last_seen_player = max(
+            self.entity.last_seen_player, general.ALERT_TURNS
+        )
+
     def perform(self) -> bool:
         # Only move the enemy in if they see the player, or have recently seem them (up to a cap)
         has_visibility = self.engine.game_map.visible[self.entity.x, self.entity.y]
@@ -65,19 +112,143 @@ class HostileEnemy(BaseAI):
             distance = max(abs(dx), abs(dy))  # Chebyshev distance
 
             if distance <= 1:
-                return MeleeAction(self.entity, dx, dy).perform()
+                return MeleeAction(self.entity, dx, dy).try_perform()
 
-            self.path = self.get_path_to(target.x, target.y)
+            self.path = self.get_path_to_player_reusing_path()
+            chasing = True
+        else:
+            chasing = False
 
         if self.path:
             dest_x, dest_y = self.path.pop(0)
-            return MovementAction(
+            moved = MovementAction(
                 self.entity,
                 dest_x - self.entity.x,
                 dest_y - self.entity.y,
-            ).perform()
+            ).try_perform()
+            if not moved and chasing:
+                # Keep the step, so the path can be reused and repaired around whatever is in the way next turn
+                self.path.insert(0, (dest_x, dest_y))
+            return moved
 
-        return WaitAction(self.entity).perform()
+        return WaitAction(self.entity).try_perform()
+
+    def get_path_to_player_reusing_path(self) -> List[Tuple[int, int]]:
+        """Return a path to the player, reusing the current path if the player hasn't moved since it was planned
+
+        Blockers that moved onto the path since then only have the parts of it they're on replanned around them, see
+        `repair_path`. Otherwise this falls back to get_path_to_player
+        """
+        game_map = self.entity.game_map
+        target = (self.engine.player.x, self.engine.player.y)
+        path = None
+        if self.path and self._path_key and self._path_key[0] == target:
+            next_x, next_y = self.path[0]
+            if max(abs(next_x - self.entity.x), abs(next_y - self.entity.y)) == 1:
+                path = self.repair_path(self.path, self._path_key[1])
+        if path is None:
+            path = self.get_path_to_player()
+        self._path_key = (target, game_map.blockers_version)
+        return path
+
+    def repair_path(
+        self, path: List[Tuple[int, int]], version: int
+    ) -> Optional[List[Tuple[int, int]]]:
+        """Return the path with a detour around each run of its next few steps that a blocker has moved onto since
+        the map's blockers_version was `version`
+
+        Blockers further along are left until they're among the next few steps, as they'll likely have moved by then.
+        Each detour is searched for within a few tiles of the run it replaces. Returns None if there's no such detour,
+        so the whole path has to be replanned
+        """
+        game_map = self.entity.game_map
+        # The last step is the player, who always blocks it
+        ahead = path[: min(len(path) - 1, general.PATH_REPAIR_LOOKAHEAD)]
+        xs, ys = np.array(ahead, dtype=np.intp).reshape(-1, 2).T
+        changed = np.flatnonzero(game_map.blockers_changed_since(version, xs, ys))
+        blocked = [
+            index
+            for index in changed.tolist()
+            if game_map.get_blocking_entity_at_location(*path[index])
+        ]
+        if not blocked:
+            return path
+
+        # Group the blocked steps into runs, each replaced by a single detour from the step before to the step after
+        runs: List[Tuple[int, int]] = []
+        for index in blocked:
+            if runs and runs[-1][1] == index:
+                runs[-1] = (runs[-1][0], index + 1)
+            else:
+                runs.append((index, index + 1))
+
+        repaired: List[Tuple[int, int]] = []
+        resume = 0  # The first step of the path that hasn't been copied or replaced yet
+        for first, end in runs:
+            repaired.extend(path[resume:first])
+            start = path[first - 1] if first else (self.entity.x, self.entity.y)
+            detour = self.get_detour(start, path[end])
+            if not detour:
+                return None
+            repaired.extend(detour)
+            resume = end + 1
+        repaired.extend(path[resume:])
+        return repaired
+
+    def get_detour(
+        self, start: Tuple[int, int], goal: Tuple[int, int]
+    ) -> List[Tuple[int, int]]:
+        """Compute and return a path between two nearby locations, searching only the tiles around them
+
+        If there is no valid path in that area then returns an empty list
+        """
+        game_map = self.entity.game_map
+        gap = max(abs(goal[0] - start[0]), abs(goal[1] - start[1]))
+        if gap == 1:
+            return [goal]
+        if gap == 2:
+            # Only one step is in the way, so first try stepping around it onto a free tile next to both ends
+            sidesteps = [
+                (x, y)
+                for x in range(max(start[0], goal[0]) - 1, min(start[0], goal[0]) + 2)
+                for y in range(max(start[1], goal[1]) - 1, min(start[1], goal[1]) + 2)
+                if game_map.in_bounds(x, y)
+                and game_map.tile_at(x, y)["walkable"]
+                and not game_map.get_blocking_entity_at_location(x, y)
+            ]
+            if sidesteps:
+                # Prefer straight steps over diagonal ones, as the pathfinding costs do
+                sidestep = min(
+                    sidesteps,
+                    key=lambda step: abs(step[0] - start[0])
+                    + abs(step[1] - start[1])
+                    + abs(goal[0] - step[0])
+                    + abs(goal[1] - step[1]),
+                )
+                return [sidestep, goal]
+
+        margin = general.PATH_REPAIR_MARGIN
+        left = max(0, min(start[0], goal[0]) - margin)
+        top = max(0, min(start[1], goal[1]) - margin)
+        right = min(game_map.width, max(start[0], goal[0]) + margin + 1)
+        bottom = min(game_map.height, max(start[1], goal[1]) + margin + 1)
+        cost = game_map.get_path_cost((slice(left, right), slice(top, bottom)))
+
+        distance = tcod.path.maxarray(cost.shape, dtype=np.int32, order="F")
+        distance[goal[0] - left, goal[1] - top] = 0
+        tcod.path.dijkstra2d(distance, cost, cardinal=2, diagonal=3, out=distance)
+        if distance[start[0] - left, start[1] - top] == np.iinfo(distance.dtype).max:
+            return []  # The goal can't be reached without leaving the area
+
+        # Walk downhill from the start to the goal and remove the starting point
+        path: List[List[int]] = tcod.path.hillclimb2d(
+            distance,
+            (start[0] - left, start[1] - top),
+            cardinal=True,
+            diagonal=True,
+        )[1:].tolist()
+
+        return [(x + left, y + top) for x, y in path]
 
 
 class ConfusedEnemy(BaseAI):
@@ -94,13 +265,20 @@ class ConfusedEnemy(BaseAI):
         self.previous_ai = previous_ai
         self.turns_remaining = turns_remaining
 
-    def perform(self) -> None:
+    def clone_for(self, entity: Actor) -> ConfusedEnemy:
+        clone = super().clone_for(entity)
+        if self.previous_ai:
+            clone.previous_ai = self.previous_ai.clone_for(entity)
+        return clone
+
+    def perform(self) -> bool:
         # Revert the AI back to the original state if the effect has run its course
         if self.turns_remaining <= 0:
             self.engine.message_log.add_message(
                 f"The {self.entity.name} is no longer confused"
             )
             self.entity.ai = self.previous_ai
+            return False
         else:
             # Pick a random direction
             direction_x, direction_y = random.choice(
@@ -124,4 +302,4 @@ class ConfusedEnemy(BaseAI):
                 self.entity,
                 direction_x,
                 direction_y,
-            ).perform()
+            ).try_perform()
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import copy
+from typing import TYPE_CHECKING, TypeVar
 
 if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity
     from game_map import GameMap
 
+T = TypeVar("T", bound="BaseComponent")
+
 
 class BaseComponent:
     parent: Entity  # Owning entity instance
@@ -18,3 +21,12 @@ class BaseComponent:
     @property
     def engine(self) -> Engine:
         return self.game_map.engine
+
+    def clone_for(self: T, parent: Entity) -> T:
+        """Return a copy of this component for a new owner, see Entity.instantiate
+
+        Attributes are shared with the original, so components holding anything mutable must override this
+        """
+        clone = copy.copy(self)
+        clone.parent = parent
+        return clone
@@ -113,20 +113,21 @@ class ReckoningConsumable(Consumable):
     def activate(self, action: actions.ItemAction) -> None:
         target_xy = action.target_xy
 
-        if not self.engine.game_map.visible[target_xy]:
+        game_map = self.engine.game_map
+        if not game_map.visible[target_xy]:
             raise ImpossibleAction("You cannot target an area that you cannot see")
 
-        targets_hit = False
-        for actor in self.engine.game_map.actors:
-            if actor.distance(*target_xy) <= self.radius:
-                self.engine.message_log.add_message(
-                    f"The {actor.name} is hammered by the inevitable, taking {self.damage} damage!",
-                    colors.light_orange,
-                )
-                actor.fighter.take_damage(self.damage)
-                targets_hit = True
+        targets = game_map.get_actors_in_area(
+            game_map.radius_area(*target_xy, self.radius)
+        )
+        for actor in targets:
+            self.engine.message_log.add_message(
+                f"The {actor.name} is hammered by the inevitable, taking {self.damage} damage!",
+                colors.light_orange,
+            )
+            actor.fighter.take_damage(self.damage)
 
-        if not targets_hit:
+        if not targets:
             raise ImpossibleAction("There are no targets in the radius")
         self.consume()
 
@@ -149,25 +150,23 @@ class HolyBlastConsumable(Consumable):
     def activate(self, action: actions.ItemAction) -> None:
         target_x, target_y = action.target_xy
 
-        if not self.engine.game_map.visible[target_x, target_y]:
+        game_map = self.engine.game_map
+        if not game_map.visible[target_x, target_y]:
             raise ImpossibleAction("You cannot target an area that you cannot see")
 
         player_hit = False
         enemy_hit = False
-        for actor in self.engine.game_map.actors:
-            # Basically draw the cross shape around the target and check if we're in it
-            if (actor.x == target_x and target_y - 2 <= actor.y <= target_y + 3) or (
-                actor.y == target_y and target_x - 2 <= actor.x <= target_x + 2
-            ):
-                if self.engine.player is actor:
-                    player_hit = True
-                else:
-                    enemy_hit = True
-                    self.engine.message_log.add_message(
-                        f"The {actor.name} is purified by flame, taking {self.damage} damage!",
-                        colors.light_orange,
-                    )
-                    actor.fighter.take_damage(self.damage)
+        cross = game_map.cross_area(target_x, target_y, left=2, right=2, up=2, down=3)
+        for actor in game_map.get_actors_in_area(cross):
+            if self.engine.player is actor:
+                player_hit = True
+            else:
+                enemy_hit = True
+                self.engine.message_log.add_message(
+                    f"The {actor.name} is purified by flame, taking {self.damage} damage!",
+                    colors.light_orange,
+                )
+                actor.fighter.take_damage(self.damage)
 
         # Handle the player last to highlight the heals
         if player_hit:
@@ -189,16 +188,9 @@ class SunbeamConsumable(Consumable):
 
     def activate(self, action: actions.ItemAction) -> None:
         consumer = action.entity
-        target = None
-        closest_distance = self.maximum_range + 1.0
-
-        for actor in self.engine.game_map.actors:
-            if actor is not consumer and self.parent.game_map.visible[actor.x, actor.y]:
-                distance = consumer.distance(actor.x, actor.y)
-
-                if distance < closest_distance:
-                    target = actor
-                    closest_distance = distance
+        target = self.engine.game_map.get_closest_actor(
+            consumer.x, consumer.y, self.maximum_range + 1.0, exclude=consumer
+        )
 
         if target:
             self.engine.message_log.add_message(
@@ -16,6 +16,17 @@ class Equipment(BaseComponent):
         self.weapon = weapon
         self.armor = armor
 
+    def clone_for(self, parent: Actor) -> Equipment:
+        """Copy this equipment, which must be cloned after the inventory holding the equipped items"""
+        clone = super().clone_for(parent)
+        for slot in ("weapon", "armor"):
+            item = getattr(self, slot)
+            if item is not None:
+                # Equip the new owner's copy of the item, rather than sharing the original
+                index = self.parent.inventory.items.index(item)
+                setattr(clone, slot, parent.inventory.items[index])
+        return clone
+
     @property
     def defense_bonus(self) -> int:
         return self._calc_total_bonus()
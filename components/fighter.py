@@ -1,18 +1,28 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import Any, Dict, Optional, TYPE_CHECKING
 
+from actor_table import TableColumn, detached_state
 from components.base_component import BaseComponent
 from constants import colors
 from render_order import RenderOrder
 
 if TYPE_CHECKING:
+    from actor_table import ActorTable
     from entity import Actor
 
 
 class Fighter(BaseComponent):
     parent: Actor
 
+    # Stored in the GameMap's ActorTable while the actor is on a map, see actor_table.py
+    max_hp = TableColumn("max_hp")
+    base_defense = TableColumn("base_defense")
+    base_power = TableColumn("base_power")
+    _hp = TableColumn("hp")
+    _table: Optional[ActorTable] = None
+    _table_slot = 0
+
     def __init__(
         self,
         hp: int,
@@ -26,6 +36,22 @@ class Fighter(BaseComponent):
         self.base_power = base_power
         self.base_power_min = base_power_min
 
+    def __getstate__(self) -> Dict[str, Any]:
+        return detached_state(self)
+
+    @property
+    def table_slot(self) -> int:
+        return self._table_slot
+
+    def attach_to_table(self, table: ActorTable, slot: int) -> None:
+        """Make this Fighter a view into a row of the table, which must already hold its stats"""
+        self._table = table
+        self._table_slot = slot
+
+    def detach_from_table(self) -> None:
+        """Copy the stats out of the table, so this Fighter holds them itself again"""
+        vars(self).update(detached_state(self))
+
     @property
     def hp(self) -> int:
         return self._hp
@@ -78,10 +104,14 @@ class Fighter(BaseComponent):
         self.parent.fg_color = colors.DEAD_BLOOD_FG_RGB
         self.parent.bg_color = colors.DEAD_BLOOD_BG_RGB
         self.parent.blocks_movement = False
+        self.game_map.blocker_changed(self.parent.x, self.parent.y)
         self.parent.render_order = RenderOrder.CORPSE
         self.parent.ai = None
+        self.game_map.actor_table.mark_dead(self.parent)
+        self.game_map.scheduler.remove(self.parent)
         self.parent.name = f"remains of {self.parent.name}"
         self.parent.light_radius = 1
+        self.game_map.entity_graphics_changed()
 
         self.engine.message_log.add_message(death_message, death_message_color)
 
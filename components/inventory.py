@@ -15,6 +15,13 @@ class Inventory(BaseComponent):
         self.capacity = capacity
         self.items: List[Item] = []
 
+    def clone_for(self, parent: Actor) -> Inventory:
+        clone = super().clone_for(parent)
+        clone.items = [item.instantiate() for item in self.items]
+        for item in clone.items:
+            item.parent = clone
+        return clone
+
     @property
     def equipped_items(self):
         return [item for item in self.items if item.equippable]
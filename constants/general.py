@@ -37,7 +37,36 @@ if TYPE_CHECKING:
 DEBUG_NO_FOG_OF_WAR = False
 
 SAVE_FILE = "into_the_dark.sav"
+AUTOSAVE_EVERY_N_TURNS = 100  # Also autosaves on each new floor
+# Messages too old to keep in memory are appended to a file in pages, named after this with a token added until the
+# game is saved, then named after the save
+MESSAGE_JOURNAL_FILE = "into_the_dark.journal"
+MESSAGE_JOURNAL_PAGE_SIZE = 100
+# How many of the most recent messages are always kept in memory
+MESSAGE_LOG_MEMORY = 500
+# Floors the player has left are packed into a file, so they're still there when they return. It's named after this with
+# a token added until the game is saved, then named after the save
+FLOOR_STORE_FILE = "into_the_dark.floors"
+LIVE_FLOORS = 2  # How many of the floors most recently left are also kept in memory, to return to instantly
 FPS = 30
+# Redraw every frame, instead of only after input or when something is animating
+ALWAYS_RENDER = False
+# Generate the next floor in a worker process while the current one is played, see prefetch.py
+PREFETCH_NEXT_FLOOR = True
+# How many of the latest timings of each function the profiler overlay summarizes, see profiler.py
+PROFILER_SAMPLES = 300
+
+# Monsters act based on their speed, at normal speed once every TURN_TICKS, see scheduler.py
+NORMAL_SPEED = 100
+TURN_TICKS = 100
+# Monsters within this many tiles of a fight involving the player hear it, and come looking for them for ALERT_TURNS
+COMBAT_NOISE_RADIUS = 3
+ALERT_TURNS = 5
+# A chasing monster's path is reused while the player stays put, with a detour around any blockers that have moved
+# onto its next PATH_REPAIR_LOOKAHEAD steps since. Each detour is searched for within PATH_REPAIR_MARGIN tiles of the
+# steps it replaces
+PATH_REPAIR_LOOKAHEAD = 4
+PATH_REPAIR_MARGIN = 3
 
 WELCOME_MESSAGES = [
     "Torchlight flickers as the monastery doors close behind you",
@@ -49,6 +78,10 @@ WELCOME_MESSAGES = [
 # Increasing the size values will "zoom out" on the content
 WIDTH, HEIGHT = 80, 45  # Manually done for 1080p
 HUD_SIZE = 4
+# The area of the console the map is drawn in, which scrolls to follow the player around larger maps
+VIEWPORT_WIDTH, VIEWPORT_HEIGHT = WIDTH, HEIGHT - HUD_SIZE
+# The size of a normal floor, which can be bigger than the viewport
+MAP_WIDTH, MAP_HEIGHT = VIEWPORT_WIDTH, VIEWPORT_HEIGHT
 
 # TODO Start fullscreen (for now just maximized as it's easier to debug)
 SDL_FLAGS = (
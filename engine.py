@@ -1,20 +1,20 @@
 from __future__ import annotations
 
-import lzma
-import pickle
 import random
 import time
-from typing import TYPE_CHECKING, Tuple
+from typing import Optional, TYPE_CHECKING, Tuple
 
 import numpy as np  # type: ignore
 import tcod.constants
 from tcod.console import Console
 from tcod.map import compute_fov
 
-import exceptions
+import profiler
 import render_functions
+from camera import Camera
 from constants import colors, general
 from message_log import MessageLog
+from scheduler import action_delay
 
 if TYPE_CHECKING:
     from entity import Actor
@@ -27,63 +27,112 @@ class Engine:
 
     def __init__(self, player: Actor):
         self.message_log: MessageLog = MessageLog()
+        # The map location under the mouse or targeting cursor
         self.mouse_location = (0, 0)
+        self.camera = Camera()
         self.player = player
         self.bar_color = None
         self.show_entire_map = False
+        self.turn_count = 0
         self._last_flicker = time.time()
+        # The flicker is purely for looks, and happens on a timer, so it has its own random numbers
+        # That way it can't change how a seeded game plays out, see recorder.py
+        self._torch_random = random.Random()
         self._next_flicker_interval = 1
 
     def save_as(self, filename: str) -> None:
         """Save this Engine instance as a compressed file."""
-        save_data = lzma.compress(pickle.dumps(self))
-        with open(filename, "wb") as f:
-            f.write(save_data)
+        from savefile import save_engine
+
+        save_engine(self, filename)
 
     def make_new_bar_color(self):
         self.bar_color = colors.generate_color()
 
+    @profiler.timed("handle_enemy_turns")
     def handle_enemy_turns(self) -> None:
-        for entity in self.game_map.entities - {self.player}:
-            try:
-                getattr(entity, "ai", None) and entity.ai.perform()
-            except exceptions.ImpossibleAction:
-                pass  # AI can get away with annnnything these days! So ignore it
+        """Let every monster that's due act, in the time it took the player to act"""
+        self.game_map.clear_player_distance()  # The player has acted, so paths to them are stale
+        self.game_map.scheduler.run_turn(action_delay(self.player.speed))
 
+    @profiler.timed("update_fov")
     def update_fov(self) -> None:
-        """Recompute the visible area based on the players point of view"""
-        self.game_map.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"],
-            (self.player.x, self.player.y),
-            radius=self.player.light_radius,
+        """Recompute the visible area based on the players point of view
+
+        Skipped entirely if nothing that affects the FOV has changed since the last call
+        """
+        game_map = self.game_map
+        x, y = self.player.x, self.player.y
+        radius = self.player.light_radius
+
+        fov_key = (x, y, radius, game_map.transparency_version)
+        if fov_key == game_map.fov_key:
+            return  # For example after waiting or using an item in place
+
+        # Nothing past the light radius can be visible, so only compute the FOV for that window of the map
+        if radius > 0:
+            window = (
+                slice(max(0, x - radius), min(game_map.width, x + radius + 1)),
+                slice(max(0, y - radius), min(game_map.height, y + radius + 1)),
+            )
+        else:  # A radius of 0 is unlimited
+            window = (slice(0, game_map.width), slice(0, game_map.height))
+
+        visible = compute_fov(
+            game_map.palette["transparent"][game_map.tile_ids[window]],
+            (x - window[0].start, y - window[1].start),
+            radius=radius,
             # TODO See the really good article on the FOV options:
             # https://www.roguebasin.com/index.php?title=Comparative_study_of_field_of_view_algorithms_for_2D_grid_based_worlds
             algorithm=tcod.constants.FOV_PERMISSIVE_1,
         )
+
+        # Only the previous window can have visible tiles left over to clear
+        game_map.visible[game_map.fov_window] = False
+        game_map.visible[window] = visible
         # If a tile is "visible" it should be added to "explored".
-        self.game_map.explored |= self.game_map.visible
+        game_map.explored.merge(window, visible)
+
+        game_map.fov_key = fov_key
+        game_map.fov_window = window
+        game_map.fov_version += 1
+
+        # Any dormant monsters the player can now see start acting again
+        game_map.wake_actors(game_map.visible)
+
+    def next_render_delay(self) -> Optional[float]:
+        """Seconds until the torch flickers again, or None if nothing on screen is animated"""
+        if not self.player.is_alive:
+            return None
+        return self._last_flicker + self._next_flicker_interval - time.time()
 
     def _flicker_torch(self):
         now = time.time()
         if now - self._last_flicker >= self._next_flicker_interval:
             base = np.array(colors.TORCH_BG_BASE)
-            variation = random.randint(
+            variation = self._torch_random.randint(
                 general.TORCH_FLICKER_COLOR_MIN, general.TORCH_FLICKER_COLOR_MAX
             )
             color = np.clip(base + variation, 0, 255)
             self._last_flicker = now
-            self._next_flicker_interval = random.uniform(
+            self._next_flicker_interval = self._torch_random.uniform(
                 general.TORCH_FLICKER_INTERVAL_MIN, general.TORCH_FLICKER_INTERVAL_MAX
             )
 
             self._update_floor_color(tuple(color.astype(int)))
 
     def _update_floor_color(self, color: Tuple[int, int, int]) -> None:
-        floor_mask = (
-            self.game_map.tiles["walkable"] & self.game_map.tiles["transparent"]
-        )
-        self.game_map.tiles["light"]["bg"][floor_mask] = color
+        if self.game_map.floor_light_bg == color:
+            return  # Such as every frame after the player has died
+
+        # Only the palette changes, however big the map is
+        palette = self.game_map.palette
+        floor_mask = palette["walkable"] & palette["transparent"]
+        palette["light"]["bg"][floor_mask] = color
+        self.game_map.floor_light_bg = color
+        self.game_map.tiles_version += 1
 
+    @profiler.timed("Engine.render")
     def render(self, console: Console, context: tcod.context.Context) -> None:
         if self.player.is_alive:
             self._flicker_torch()
@@ -98,7 +147,10 @@ class Engine:
             height=general.MESSAGE_LOG_HEIGHT,
         )
 
-        self.game_map.render(console)
+        self.camera.follow(
+            self.player.x, self.player.y, self.game_map.width, self.game_map.height
+        )
+        self.game_map.render(console, self.camera)
 
         render_functions.render_hp_bar(
             console=console,
@@ -120,6 +172,9 @@ class Engine:
                 dungeon_level=self.game_world.current_floor,
             )
 
+        if profiler.enabled:
+            render_functions.render_profiler(console)
+
         render_functions.render_names_at_mouse_location(
             console=console,
             engine=self,
@@ -6,6 +6,7 @@ from typing import Optional, Tuple, Type, TypeVar, TYPE_CHECKING, Union
 
 from components.equipment import Equipment
 from components.level import Level
+from constants import general
 from render_order import RenderOrder
 
 if TYPE_CHECKING:
@@ -52,31 +53,46 @@ class Entity:
         if parent:
             # If parent isn't provided now then it will be set later
             self.parent = parent
-            parent.entities.add(self)
+            parent.add_entity(self)
 
     @property
     def game_map(self) -> GameMap:
         return self.parent.game_map
 
+    def instantiate(self: T) -> T:
+        """Return a new entity built from this one as a prototype, such as those in entity_factory
+
+        Plain attributes (names, colors, numbers) are immutable so are shared with the prototype,
+        and each component is cloned for the new entity, which is much cheaper than a deepcopy
+        """
+        clone = copy.copy(self)
+        vars(clone).pop("parent", None)
+        return clone
+
     def spawn(self: T, game_map: GameMap, x: int, y: int) -> T:
         """Spawn a copy of this instance at the given location"""
-        clone = copy.deepcopy(self)
+        clone = self.instantiate()
         clone.x = x
         clone.y = y
         clone.parent = game_map
-        game_map.entities.add(clone)
+        game_map.add_entity(clone)
         return clone
 
     def place(self, x: int, y: int, game_map: Optional[GameMap] = None) -> None:
         """Place this entity at a new location. Handles moving across GameMaps"""
-        self.x = x
-        self.y = y
         if game_map:
             if hasattr(self, "parent"):  # Possibly uninitialized
                 if self.parent is self.game_map:
-                    self.game_map.entities.remove(self)
+                    self.game_map.remove_entity(self)
+            self.x = x
+            self.y = y
             self.parent = game_map
-            game_map.entities.add(self)
+            game_map.add_entity(self)
+        elif hasattr(self, "parent") and self.parent is self.game_map:
+            self.game_map.move_entity(self, x, y)
+        else:
+            self.x = x
+            self.y = y
 
     def distance(self, x: int, y: int) -> float:
         """
@@ -86,8 +102,7 @@ class Entity:
 
     def move(self, dx: int, dy: int) -> None:
         # Move the entity by the given amount
-        self.x += dx
-        self.y += dy
+        self.place(self.x + dx, self.y + dy)
 
 
 class Actor(Entity):
@@ -101,6 +116,7 @@ class Actor(Entity):
         bg_color: Tuple[int, int, int] = None,
         name: str = "<Unnamed>",
         light_radius: int = 8,
+        speed: int = general.NORMAL_SPEED,
         ai_cls: Type[BaseAI],
         fighter: Fighter,
         level: Level,
@@ -120,6 +136,8 @@ class Actor(Entity):
         )
 
         self.ai: Optional[BaseAI] = ai_cls(self)
+        # How often this actor gets to act, where double NORMAL_SPEED acts twice a turn
+        self.speed = speed
 
         self.fighter = fighter
         self.fighter.parent = self
@@ -135,6 +153,18 @@ class Actor(Entity):
         if inventory:
             self.inventory.parent = self
 
+    def instantiate(self) -> Actor:
+        clone = super().instantiate()
+        clone.ai = self.ai.clone_for(clone) if self.ai else None
+        clone.fighter = self.fighter.clone_for(clone)
+        clone.level = self.level.clone_for(clone)
+        # The inventory goes first, as the equipment refers to the items in it
+        if self.inventory:
+            clone.inventory = self.inventory.clone_for(clone)
+        if self.equipment:
+            clone.equipment = self.equipment.clone_for(clone)
+        return clone
+
     @property
     def is_alive(self) -> bool:
         """Returns True as long as this actor can perform actions"""
@@ -174,3 +204,11 @@ class Item(Entity):
         self.equippable = equippable
         if self.equippable:
             self.equippable.parent = self
+
+    def instantiate(self) -> Item:
+        clone = super().instantiate()
+        if self.consumable:
+            clone.consumable = self.consumable.clone_for(clone)
+        if self.equippable:
+            clone.equippable = self.equippable.clone_for(clone)
+        return clone
@@ -0,0 +1,94 @@
+"""Floors the player has left, kept in a file so going back to one doesn't need them all in memory"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from constants import general
+
+
+class FloorStore:
+    """Compressed floors appended to a file, and read back when the player returns to them
+
+    `index` holds where the latest copy of each floor starts and ends in the file. A floor that's stored again is
+    appended rather than overwritten, so a save made before then still finds the copy it was saved with
+
+    Until the game is saved the file is named after FLOOR_STORE_FILE, with a random token added so no other game writes
+    to it. Saving moves it next to the save, and drops the older copies of floors, see `move_to`. The file is only
+    created once a floor is put in it, and a game quit without saving deletes it, see main.discard_game
+    """
+
+    def __init__(
+        self,
+        filename: Optional[str] = None,
+        index: Iterable[Tuple[int, Tuple[int, int]]] = (),
+    ):
+        if filename is None:
+            root, extension = os.path.splitext(general.FLOOR_STORE_FILE)
+            filename = f"{root}.{os.urandom(4).hex()}{extension}"
+        self.filename = filename
+        self.index: Dict[int, Tuple[int, int]] = dict(index)
+
+    def __contains__(self, floor_number: int) -> bool:
+        return floor_number in self.index
+
+    @property
+    def end(self) -> int:
+        """Where the next floor is appended to the file"""
+        return max((end for _, end in self.index.values()), default=0)
+
+    def put(self, floor_number: int, data: bytes) -> None:
+        """Write a floor packed by savefile.pack_floor to the end of the store"""
+        end = self.end
+        # Anything past the end was written after the save this store was loaded with, so is replaced
+        exists = end and os.path.exists(self.filename)
+        with open(self.filename, "r+b" if exists else "wb") as f:
+            f.seek(end)
+            f.write(data)
+            f.truncate()
+        self.index[floor_number] = (end, end + len(data))
+
+    def get(self, floor_number: int) -> Optional[bytes]:
+        """Return the packed data of a floor, or None if it was never stored or the file has since been lost"""
+        if floor_number not in self.index:
+            return None
+        start, end = self.index[floor_number]
+        try:
+            with open(self.filename, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+        except OSError:
+            return None
+        return data if len(data) == end - start else None
+
+    def move_to(self, filename: str) -> None:
+        """Keep the store in the given file from now on, such as one named after the save it goes with
+
+        Only the latest copy of each floor is written there. If the store is already in that file, it's only rewritten
+        once older copies take up more of it than the latest ones
+        """
+        latest = sum(end - start for start, end in self.index.values())
+        if filename == self.filename and self.end - latest <= latest:
+            return
+
+        index: Dict[int, Tuple[int, int]] = {}
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, "wb") as f:
+            for floor_number in self.index:
+                data = self.get(floor_number)
+                if data is not None:
+                    index[floor_number] = (f.tell(), f.tell() + len(data))
+                    f.write(data)
+        os.replace(temp_filename, filename)
+
+        if filename != self.filename and os.path.exists(self.filename):
+            os.remove(self.filename)
+        self.filename = filename
+        self.index = index
+
+    def delete(self) -> None:
+        """Delete the store file, such as when the game is over"""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        self.index.clear()
@@ -1,19 +1,41 @@
 from __future__ import annotations
 
 import math
+import os
 import random
-from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
 
 import numpy as np  # type: ignore
+import tcod
 from tcod.console import Console
 
+import prefetch
+import profiler
 import tile_types
+from actor_table import ActorTable
+from bitmask import BitMask
+from floor_store import FloorStore
 from constants import colors, general
 from entity import Actor, Item
+from scheduler import TurnScheduler
 
 if TYPE_CHECKING:
+    from camera import Camera
     from engine import Engine
     from entity import Entity
+    from gen_map import FloorPlan
 
 
 class GameMap:
@@ -22,39 +44,178 @@ class GameMap:
     ):
         self.engine = engine
         self.width, self.height = width, height
-        self.entities = set(entities)
-        self.tiles = np.full((width, height), fill_value=tile_types.wall, order="F")
+        self.entities = set()
+        # Entities bucketed by their (x, y) location, so lookups don't have to scan every entity
+        self._entity_locations: Dict[Tuple[int, int], List[Entity]] = {}
+        # Positions and combat stats of the actors on this map as NumPy columns, for vectorized queries
+        self.actor_table = ActorTable()
+        # Monsters on this map that act by themselves, in the order they'll act
+        self.scheduler = TurnScheduler()
+        # Each tile is an index into the palette, which holds the full tile type (walkable, graphics, etc.)
+        self.palette = tile_types.make_palette()
+        self.tile_ids = np.full(
+            (width, height), fill_value=tile_types.WALL, dtype=np.uint8, order="F"
+        )
 
-        self.visible = np.full(
-            (width, height), fill_value=False, order="F"
-        )  # Tiles the player can currently see
-        self.explored = np.full(
-            (width, height), fill_value=False, order="F"
-        )  # Tiles the player has seen before
+        self.visible = BitMask(width, height)  # Tiles the player can currently see
+        self.explored = BitMask(width, height)  # Tiles the player has seen before
 
         self.downstairs_location = (0, 0)
+        self.upstairs_location = (0, 0)
+        # How the floor was lit when the player left it, put back when they return, see GameWorld.go_to_floor
+        self.show_entire_map = False
+        self.light_radius: Optional[int] = None
+        self.bar_color: Optional[Tuple[int, int, int]] = None
+
+        # Bumped whenever the tiles are replaced, so the cached FOV is recomputed
+        self.transparency_version = 0
+        # What the current "visible" array was computed from, and the area of it that may be set
+        self.fov_key: Optional[Tuple[int, int, int, int]] = None
+        self.fov_window: Tuple[slice, slice] = (slice(0, 0), slice(0, 0))
+        # Bumped every time the "visible" and "explored" arrays are changed
+        self.fov_version = 0
+
+        # Bump this whenever the tile ids or palette graphics change, so the cached tile layer is redrawn
+        self.tiles_version = 0
+        self.floor_light_bg: Optional[Tuple[int, int, int]] = None
+        # Rendering caches, see render()
+        self._tile_layer: Optional[np.ndarray] = None
+        self._tile_layer_key: Optional[tuple] = None
+        self._entity_layer: Optional[Tuple[np.ndarray, ...]] = None
+
+        # Distance from each tile to the player, shared by every AI for the current turn
+        self._player_distance: Optional[np.ndarray] = None
+        # The blockers_version when a blocking entity last arrived at or left each location
+        self._blockers_version = 0
+        self._blockers_changed_at = np.zeros((width, height), dtype=np.int32, order="F")
+
+        for entity in entities:
+            self.add_entity(entity)
 
     @property
     def game_map(self) -> GameMap:
         return self
 
+    @property
+    def tiles(self) -> np.ndarray:
+        """A full copy of every tile type on the map, which is slow for a large map
+
+        Prefer `tile_field`, or `tile_at` for a single tile
+        """
+        return self.palette[self.tile_ids]
+
+    @tiles.setter
+    def tiles(self, tiles: np.ndarray) -> None:
+        """Replace every tile, building a new palette from the tile types used"""
+        raw = np.ascontiguousarray(tiles, dtype=tile_types.tile_dt).reshape(-1)
+        palette, tile_ids = np.unique(
+            raw.view(f"V{raw.dtype.itemsize}"), return_inverse=True
+        )
+        if len(palette) > 256:
+            raise ValueError(f"Too many tile types for one map ({len(palette)})")
+        self.palette = palette.view(tile_types.tile_dt)
+        self.tile_ids = np.asfortranarray(
+            tile_ids.astype(np.uint8).reshape(np.shape(tiles))
+        )
+        self.tiles_version += 1
+        self.transparency_version += 1
+
+    def tile_at(self, x: int, y: int) -> np.void:
+        """Return the tile type at the given location"""
+        return self.palette[self.tile_ids[x, y]]
+
+    def tile_field(self, field: str) -> np.ndarray:
+        """Return one field of every tile's type, such as "walkable", as an array the shape of the map"""
+        return self.palette[field][self.tile_ids]
+
     @property
     def actors(self) -> Iterator[Actor]:
         """Iterate over this maps living actors"""
-        yield from (
-            entity
-            for entity in self.entities
-            if isinstance(entity, Actor) and entity.is_alive
-        )
+        yield from self.actor_table.living_actors()
 
     @property
     def items(self) -> Iterator[Item]:
         yield from (entity for entity in self.entities if isinstance(entity, Item))
 
+    def add_entity(self, entity: Entity) -> None:
+        """Add an entity to this map at its current location"""
+        self.entities.add(entity)
+        self._entity_locations.setdefault((entity.x, entity.y), []).append(entity)
+        if isinstance(entity, Actor):
+            self.actor_table.add(entity)
+            if entity.is_alive and entity is not self.engine.player:
+                self.scheduler.add(
+                    entity,
+                    dormant=entity.ai.is_idle()
+                    and not self.visible[entity.x, entity.y],
+                )
+        if entity.blocks_movement:
+            self.blocker_changed(entity.x, entity.y)
+        self._entity_layer = None
+
+    def remove_entity(self, entity: Entity) -> None:
+        """Remove an entity from this map, if it is on it"""
+        if entity not in self.entities:
+            return
+
+        self.entities.remove(entity)
+        self._unindex_entity(entity)
+        if isinstance(entity, Actor):
+            self.actor_table.remove(entity)
+            self.scheduler.remove(entity)
+        if entity.blocks_movement:
+            self.blocker_changed(entity.x, entity.y)
+        self._entity_layer = None
+
+    def move_entity(self, entity: Entity, x: int, y: int) -> None:
+        """Change the location of an entity on this map, keeping the location index in sync"""
+        self._unindex_entity(entity)
+        if entity.blocks_movement:
+            self.blocker_changed(entity.x, entity.y)
+            self.blocker_changed(x, y)
+        entity.x = x
+        entity.y = y
+        self._entity_locations.setdefault((x, y), []).append(entity)
+        if isinstance(entity, Actor):
+            self.actor_table.move(entity)
+        self._entity_layer = None
+
+    @property
+    def blockers_version(self) -> int:
+        """Bumped every time a blocking entity arrives at or leaves a location on this map"""
+        return self._blockers_version
+
+    def blocker_changed(self, x: int, y: int) -> None:
+        """Call when a blocking entity arrives at or leaves the given location, such as a monster dying there"""
+        self._blockers_version += 1
+        self._blockers_changed_at[x, y] = self._blockers_version
+
+    def blockers_changed_since(
+        self, version: int, xs: np.ndarray, ys: np.ndarray
+    ) -> np.ndarray:
+        """Return which of the given locations a blocking entity has come to or gone from since `blockers_version`
+        was `version`
+        """
+        return self._blockers_changed_at[xs, ys] > version
+
+    def entity_graphics_changed(self) -> None:
+        """Call when an entity on this map changes how it looks, such as turning into a corpse"""
+        self._entity_layer = None
+
+    def _unindex_entity(self, entity: Entity) -> None:
+        location = (entity.x, entity.y)
+        entities_here = self._entity_locations[location]
+        entities_here.remove(entity)
+        if not entities_here:
+            del self._entity_locations[location]
+
+    def get_entities_at_location(self, x: int, y: int) -> List[Entity]:
+        """Return every entity at the given location, which may be an empty list"""
+        return list(self._entity_locations.get((x, y), ()))
+
     def get_entity_at_location(self, x: int, y: int) -> Optional[Entity]:
-        for entity in self.entities:
-            if entity.x == x and entity.y == y:
-                return entity
+        for entity in self._entity_locations.get((x, y), ()):
+            return entity
         return None
 
     def get_blocking_entity_at_location(
@@ -62,62 +223,295 @@ class GameMap:
         location_x: int,
         location_y: int,
     ) -> Optional[Entity]:
-        for entity in self.entities:
-            if (
-                entity.blocks_movement
-                and entity.x == location_x
-                and entity.y == location_y
-            ):
+        for entity in self._entity_locations.get((location_x, location_y), ()):
+            if entity.blocks_movement:
                 return entity
         return None
 
     def get_actor_at_location(self, x: int, y: int) -> Optional[Actor]:
-        for actor in self.actors:
-            if actor.x == x and actor.y == y:
-                return actor
+        for entity in self._entity_locations.get((x, y), ()):
+            if isinstance(entity, Actor) and entity.is_alive:
+                return entity
         return None
 
+    def get_path_cost(self, window: Optional[Tuple[slice, slice]] = None) -> np.ndarray:
+        """Return a cost array for pathfinding, where 0 is impassable
+
+        Covers the whole map, or just the given (slice, slice) window of it
+        """
+        if window is None:
+            window = (slice(0, self.width), slice(0, self.height))
+        # Copy the walkable array
+        cost = self.palette["walkable"][self.tile_ids[window]].astype(np.int8)
+
+        # Only living actors block movement
+        table = self.actor_table
+        slots = table.living_slots()
+        xs = table.x[slots] - window[0].start
+        ys = table.y[slots] - window[1].start
+        inside = (xs >= 0) & (xs < cost.shape[0]) & (ys >= 0) & (ys < cost.shape[1])
+        xs, ys = xs[inside], ys[inside]
+        # Check that the cost isn't zero (aka blocking)
+        passable = cost[xs, ys] > 0
+        # Add to the cost of a blocked position
+        # A lower number means more enemies will crowd behind each other in
+        # hallways. A higher number means enemies will take longer paths in
+        # order to surround the player.
+        cost[xs[passable], ys[passable]] += 10
+
+        return cost
+
+    def get_player_distance(self) -> np.ndarray:
+        """Return the walking distance from every tile to the player
+
+        This is computed once and reused by every AI until `clear_player_distance` is called
+        """
+        if self._player_distance is None:
+            player = self.engine.player
+            self._player_distance = tcod.path.maxarray(
+                (self.width, self.height), dtype=np.int32, order="F"
+            )
+            self._player_distance[player.x, player.y] = 0
+            tcod.path.dijkstra2d(
+                self._player_distance, self.get_path_cost(), cardinal=2, diagonal=3
+            )
+        return self._player_distance
+
+    def clear_player_distance(self) -> None:
+        """Throw away the cached player distance, such as when the player or monsters have moved"""
+        self._player_distance = None
+
     def in_bounds(self, x: int, y: int) -> bool:
         """Return True if x and y are inside of the bounds of this map"""
         return 0 <= x < self.width and 0 <= y < self.height
 
-    def render(self, console: Console) -> None:
+    def _offsets_from(self, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the x and y offset of every tile from the given point, as arrays that broadcast to the map shape"""
+        return np.arange(self.width)[:, np.newaxis] - x, np.arange(self.height) - y
+
+    def radius_area(self, x: int, y: int, radius: int) -> np.ndarray:
+        """Return a mask of the tiles within `radius` of the given point"""
+        dx, dy = self._offsets_from(x, y)
+        return dx**2 + dy**2 <= radius**2
+
+    def cross_area(
+        self, x: int, y: int, left: int, right: int, up: int, down: int
+    ) -> np.ndarray:
+        """Return a mask of a cross centered on the given point, with arms of the given lengths"""
+        dx, dy = self._offsets_from(x, y)
+        return ((dx == 0) & (-up <= dy) & (dy <= down)) | (
+            (dy == 0) & (-left <= dx) & (dx <= right)
+        )
+
+    def line_area(
+        self, origin: Tuple[int, int], target: Tuple[int, int], length: int
+    ) -> np.ndarray:
+        """Return a mask of a line from the origin (not included) through the target, stopping at walls"""
+        area = np.zeros((self.width, self.height), dtype=bool, order="F")
+        origin_x, origin_y = origin
+        dx, dy = target[0] - origin_x, target[1] - origin_y
+        if not dx and not dy:
+            return area
+
+        # Extend the line past the target so it always covers the full length
+        scale = math.ceil(length / max(abs(dx), abs(dy)))
+        end = (origin_x + dx * scale, origin_y + dy * scale)
+        for x, y in tcod.los.bresenham(origin, end)[1 : length + 1].tolist():
+            if not self.in_bounds(x, y) or not self.tile_at(x, y)["transparent"]:
+                break
+            area[x, y] = True
+        return area
+
+    def cone_area(
+        self,
+        origin: Tuple[int, int],
+        target: Tuple[int, int],
+        length: int,
+        angle: float,
+    ) -> np.ndarray:
+        """Return a mask of a cone spreading from the origin (not included) towards the target
+
+        `angle` is the full width of the cone in degrees
+        """
+        dx, dy = self._offsets_from(*origin)
+        direction = math.atan2(target[1] - origin[1], target[0] - origin[0])
+        # Difference between each tile's bearing and the cone's direction, wrapped to [-pi, pi]
+        bearing = np.arctan2(dy, dx) - direction
+        bearing = (bearing + math.pi) % (2 * math.pi) - math.pi
+        distance_squared = dx**2 + dy**2
+        return (
+            (distance_squared > 0)
+            & (distance_squared <= length**2)
+            & (np.abs(bearing) <= math.radians(angle) / 2)
+        )
+
+    def get_actors_in_area(
+        self, area: Union[np.ndarray, BitMask], visible_only: bool = True
+    ) -> List[Actor]:
+        """Return the living actors standing on the tiles set in the `area` mask, and in the player's FOV by default"""
+        table = self.actor_table
+        slots = table.living_slots()
+        xs, ys = table.x[slots], table.y[slots]
+        hit = area[xs, ys]
+        if visible_only:
+            hit &= self.visible[xs, ys]
+        return [table.actors[slot] for slot in slots[hit]]
+
+    def wake_actors(
+        self, area: Union[np.ndarray, BitMask], alert: bool = False
+    ) -> None:
+        """Wake up the dormant actors on the tiles set in the `area` mask
+
+        With `alert`, such as for a noise, their AI is also told to come looking for the player
         """
-        Renders the map
+        for actor in self.get_actors_in_area(area, visible_only=False):
+            if actor is not self.engine.player:
+                self.scheduler.wake(actor)
+                if alert:
+                    actor.ai.alert()
+
+    def make_noise(self, x: int, y: int, radius: int) -> None:
+        """Alert every monster within `radius` of the given point, whether or not the player can see them"""
+        if radius > 0:
+            self.wake_actors(self.radius_area(x, y, radius), alert=True)
+
+    def get_closest_actor(
+        self,
+        x: int,
+        y: int,
+        maximum_distance: float,
+        exclude: Optional[Actor] = None,
+        visible_only: bool = True,
+    ) -> Optional[Actor]:
+        """Return the living actor closest to the given point and less than `maximum_distance` away from it"""
+        table = self.actor_table
+        slots = table.living_slots()
+        if exclude is not None and exclude.parent is self:
+            slots = slots[slots != exclude.fighter.table_slot]
+        xs, ys = table.x[slots], table.y[slots]
+        distance_squared = (xs - x) ** 2 + (ys - y) ** 2
+        candidates = distance_squared < maximum_distance**2
+        if visible_only:
+            candidates &= self.visible[xs, ys]
+        if not candidates.any():
+            return None
+
+        closest = np.where(candidates, distance_squared, np.inf).argmin()
+        return table.actors[slots[closest]]
+
+    @profiler.timed("GameMap.render")
+    def render(self, console: Console, camera: Camera) -> None:
+        """
+        Renders the part of the map the camera is looking at, so the cost doesn't depend on the size of the map
 
         If a tile is in the "visible" array, then draw it with the "light" colors
         If it isn't, but it's in the "explored" array, then draw it with the "dark" colors
         Otherwise, the default is the fog of war
         """
-        console.rgb[0 : self.width, 0 : self.height] = np.select(
-            condlist=[self.visible, self.explored],
-            choicelist=[self.tiles["light"], self.tiles["dark"]],
-            default=(
-                self.tiles["dark"]
-                if general.DEBUG_NO_FOG_OF_WAR or self.engine.show_entire_map
-                else general.FOG_OF_WAR
-            ),
+        console.rgb[0 : camera.view_width, 0 : camera.view_height] = (
+            self._get_tile_layer(camera)
         )
 
-        entities_sorted_for_rendering = sorted(
-            self.entities, key=lambda x: x.render_order.value
+        xs, ys, graphics, has_bg = self._get_entity_layer()
+
+        # Only draw entities that are in the FOV, which also skips most that are off screen
+        shown = self.visible[xs, ys]
+        shown &= (xs >= camera.x) & (xs < camera.x + camera.view_width)
+        shown &= (ys >= camera.y) & (ys < camera.y + camera.view_height)
+        xs, ys = xs - camera.x, ys - camera.y
+        self._draw_top_entities(
+            console, xs[shown], ys[shown], graphics[shown], "ch", "fg"
+        )
+        # Entities without a background color keep whatever is underneath them
+        shown &= has_bg
+        self._draw_top_entities(console, xs[shown], ys[shown], graphics[shown], "bg")
+
+    def _get_tile_layer(self, camera: Camera) -> np.ndarray:
+        """Return the tiles on screen as they should be drawn, only recomputed when the camera, FOV or tiles change"""
+        show_entire_map = general.DEBUG_NO_FOG_OF_WAR or self.engine.show_entire_map
+        window = camera.window
+        tile_layer_key = (
+            self.fov_version,
+            self.tiles_version,
+            show_entire_map,
+            (window[0].start, window[0].stop, window[1].start, window[1].stop),
         )
 
-        for entity in entities_sorted_for_rendering:
-            # Only print entities that are in the FOV
-            if self.visible[entity.x, entity.y]:
-                console.print(
-                    x=entity.x,
-                    y=entity.y,
-                    string=entity.char,
-                    fg=entity.fg_color,
-                    bg=entity.bg_color,
+        if self._tile_layer is None or tile_layer_key != self._tile_layer_key:
+            # One table of every graphic a tile can be drawn with: lit by palette id, then dark, then the fog
+            palette_size = len(self.palette)
+            graphics = np.concatenate(
+                [self.palette["light"], self.palette["dark"], [general.FOG_OF_WAR]]
+            )
+            tile_ids = self.tile_ids[window].astype(np.int16)  # Room for the offset ids
+            index = np.where(
+                self.visible[window],
+                tile_ids,
+                np.where(
+                    show_entire_map or self.explored[window],
+                    tile_ids + palette_size,
+                    2 * palette_size,
+                ),
+            )
+            self._tile_layer = graphics[index]
+            self._tile_layer_key = tile_layer_key
+
+        return self._tile_layer
+
+    def _get_entity_layer(self) -> Tuple[np.ndarray, ...]:
+        """Return the entity locations and graphics as arrays, sorted so later entries draw on top
+
+        Only rebuilt after entities are added, removed, moved or change their graphics
+        """
+        if self._entity_layer is None:
+            entities_sorted_for_rendering = sorted(
+                self.entities, key=lambda x: x.render_order.value
+            )
+            count = len(entities_sorted_for_rendering)
+
+            xs = np.fromiter(
+                (entity.x for entity in entities_sorted_for_rendering), np.intp, count
+            )
+            ys = np.fromiter(
+                (entity.y for entity in entities_sorted_for_rendering), np.intp, count
+            )
+            graphics = np.zeros(count, dtype=general.GRAPHIC_DT)
+            has_bg = np.zeros(count, dtype=bool)
+            for i, entity in enumerate(entities_sorted_for_rendering):
+                graphics[i] = (
+                    ord(entity.char),
+                    entity.fg_color,
+                    entity.bg_color or (0, 0, 0),
                 )
+                has_bg[i] = entity.bg_color is not None
+
+            self._entity_layer = (xs, ys, graphics, has_bg)
+
+        return self._entity_layer
+
+    def _draw_top_entities(
+        self,
+        console: Console,
+        xs: np.ndarray,
+        ys: np.ndarray,
+        graphics: np.ndarray,
+        *fields: str,
+    ) -> None:
+        """Draw the given graphics fields in one go, using the last entry at each location"""
+        # np.unique keeps the first occurrence of each location, so search backwards for the top-most entity
+        _, last = np.unique((xs * self.height + ys)[::-1], return_index=True)
+        top = len(xs) - 1 - last
+
+        for field in fields:
+            console.rgb[field][xs[top], ys[top]] = graphics[field][top]
 
 
 class GameWorld:
     """
-    Holds the settings for the GameMap, and generates new maps when moving down the stairs
+    Holds the settings for the GameMap, and moves the player between floors
+
+    Floors are generated the first time they're reached. Once the player leaves one it's packed into the floor store,
+    and the few most recently left are also kept in memory, so taking the stairs back is instant
     """
 
     def __init__(
@@ -125,60 +519,134 @@ class GameWorld:
         *,
         engine: Engine,
         current_floor: int = 0,
+        seed: Optional[int] = None,
     ):
         self.engine = engine
         self.current_floor = current_floor
+        # Every floor is generated from this and its floor number, so the same seed always makes the same dungeon
+        self.seed = random.getrandbits(64) if seed is None else seed
+        # Tells this game apart from any other, even one played from the same seed
+        # Not taken from the random module, so it doesn't change how a seeded game plays out
+        self.creation_id: Optional[str] = os.urandom(8).hex()
+        self.floor_store = FloorStore()
+        # Floors recently left, least recently left first, which are also in the floor store
+        self._live_floors: OrderedDict[int, GameMap] = OrderedDict()
+        # The next floor being planned in a worker process, see prefetch.py
+        self._prefetch: Optional[Tuple[int, Future]] = None
 
+    @property
+    def game_key(self) -> Tuple[int, Optional[str]]:
+        """Kept with everything this game writes outside its save, to check it's this game's when read back"""
+        return self.seed, self.creation_id
+
+    def prefetch_next_floor(self) -> None:
+        """Start planning the floor below this one in the background, ready for when the stairs are taken"""
+        next_floor = self.current_floor + 1
+        if next_floor in self.floor_store or (
+            self._prefetch and self._prefetch[0] == next_floor
+        ):
+            return  # Nothing to plan, or already underway
+        future = prefetch.submit(self.seed, next_floor)
+        self._prefetch = (next_floor, future) if future else None
+
+    def _take_plan(self, floor_number: int) -> FloorPlan:
+        """Return the prefetched plan for the given floor if there is one, otherwise plan it now"""
+        from gen_map import plan_floor
+
+        plan = None
+        if self._prefetch and self._prefetch[0] == floor_number:
+            plan = prefetch.result(self._prefetch[1])
+            self._prefetch = None
+        return plan or plan_floor(self.seed, floor_number)
+
+    def go_to_floor(self, floor_number: int) -> None:
+        """Move the player to another floor, arriving on the stairs they'd have taken to get there"""
+        engine = self.engine
+        going_down = floor_number > self.current_floor
+        previous_floor = self.current_floor
+        previous_map: Optional[GameMap] = getattr(engine, "game_map", None)
+        if previous_map is not None:
+            previous_map.show_entire_map = engine.show_entire_map
+            previous_map.light_radius = engine.player.light_radius
+            previous_map.bar_color = engine.bar_color
+
+        self.current_floor = floor_number
+        game_map = self._restore_floor(floor_number)
+        if game_map is None:
+            self.generate_floor()
+            if not going_down:  # Only for saves from before floors were kept
+                engine.player.place(*engine.game_map.downstairs_location)
+        else:
+            engine.show_entire_map = game_map.show_entire_map
+            if game_map.light_radius is not None:
+                engine.player.light_radius = game_map.light_radius
+            engine.bar_color = game_map.bar_color
+            # The FOV is recomputed even if the player is back where they left, to wake up anything in sight
+            game_map.fov_key = None
+            arrival = (
+                game_map.upstairs_location
+                if going_down
+                else game_map.downstairs_location
+            )
+            engine.player.place(*arrival, game_map)
+            engine.game_map = game_map
+
+        # Only stored now the player is off it
+        if previous_map is not None:
+            self._keep_floor(previous_floor, previous_map)
+
+        engine.update_fov()
+        self.prefetch_next_floor()
+
+    @profiler.timed("generate_floor")
     def generate_floor(self) -> None:
-        from gen_map import generate_dungeon
-
-        self.current_floor += 1
-        self.engine.show_entire_map = False
-
-        # Customize how our tiles look (symbols and colors)
-        tile_types.generate_tiles()
-        map_width = general.WIDTH
-        map_height = general.HEIGHT - general.HUD_SIZE
-
-        # Note for the room cap, if a room intersects we skip it, so it's okay to have a potential lot here
-        max_rooms = math.ceil(map_width * map_height / random.randint(5, 80))
-        room_min_size = random.randint(2, 6)
-        room_max_size = room_min_size + random.randint(2, 5)
-
-        # Some of the crazier options only happen after they have a normal floor, to give a bit of a fair/consistent start
-        if self.current_floor > 1:
-            # Have a chance for a smaller map after the first floor
-            if random.random() > 0.75:
-                map_width = random.randint(general.WIDTH // 4, general.WIDTH)
-                map_height = max(
-                    random.randint(general.HEIGHT // 4, general.HEIGHT)
-                    - general.HUD_SIZE,
-                    general.HUD_SIZE * 2,
-                )
+        """Generate the current floor for the first time, and put the player at its start"""
+        from gen_map import build_floor
+
+        plan = self._take_plan(self.current_floor)
 
+        self.engine.show_entire_map = plan.show_entire_map
+        if plan.show_entire_map:
             # Sometimes get no fog of war...black sheep wall
-            if random.random() > 0.9:
-                self.engine.message_log.add_message(
-                    "You are BLESSED with divine sight", colors.yellow
-                )
-                self.engine.show_entire_map = True
-
-            # TODO Randomize our light radius per floor for fun - should eventually dwindle over time as a resource?
-            # And of course the chance for something REALLY wild, that almost looks like a bug haha
-            if random.random() > 0.95:
-                self.engine.player.light_radius = random.randint(10, 20)
-            else:
-                self.engine.player.light_radius = random.randint(2, 5)
-
-        self.engine.make_new_bar_color()
-
-        self.engine.game_map = generate_dungeon(
-            max_rooms=max_rooms,
-            room_min_size=room_min_size,
-            room_max_size=room_max_size,
-            map_width=map_width,
-            map_height=map_height,
-            engine=self.engine,
+            self.engine.message_log.add_message(
+                "You are BLESSED with divine sight", colors.yellow
+            )
+        if plan.light_radius is not None:
+            self.engine.player.light_radius = plan.light_radius
+        self.engine.bar_color = plan.bar_color
+
+        self.engine.game_map = build_floor(plan, self.engine)
+
+    def _floor_key(self, floor_number: int) -> Tuple[Any, int]:
+        """Return the key a floor is packed with, so one of another game or floor is never unpacked in its place"""
+        if self.creation_id is None:
+            return (
+                self.seed,
+                floor_number,
+            )  # Saves from before games had a creation id packed floors with this
+        return self.game_key, floor_number
+
+    def _keep_floor(self, floor_number: int, game_map: GameMap) -> None:
+        """Pack a floor the player just left into the floor store, and keep it in memory until it's least recent"""
+        from savefile import pack_floor
+
+        self.floor_store.put(
+            floor_number,
+            pack_floor(self.engine, game_map, self._floor_key(floor_number)),
         )
-
-        self.engine.update_fov()
+        self._live_floors[floor_number] = game_map
+        while len(self._live_floors) > general.LIVE_FLOORS:
+            self._live_floors.popitem(last=False)
+
+    def _restore_floor(self, floor_number: int) -> Optional[GameMap]:
+        """Return a floor the player has been on before, or None if it has to be generated"""
+        from savefile import unpack_floor
+
+        game_map = self._live_floors.pop(floor_number, None)
+        if game_map is None:
+            data = self.floor_store.get(floor_number)
+            if data is not None:
+                game_map = unpack_floor(
+                    self.engine, data, self._floor_key(floor_number)
+                )
+        return game_map
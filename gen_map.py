@@ -1,16 +1,18 @@
 from __future__ import annotations
 
+import math
 import random
-from typing import Dict, Iterator, List, Tuple, TYPE_CHECKING
+from typing import Dict, List, Optional, Set, Tuple, TYPE_CHECKING
 
-import tcod
+import numpy as np  # type: ignore
 
 import entity_factory
 import tile_types
+from constants import colors, general
+from entity import Entity
 from game_map import GameMap
 
 if TYPE_CHECKING:
-    from entity import Entity
     from engine import Engine
 
 MAX_ITEMS_BY_FLOOR = [
@@ -36,6 +38,13 @@ CHANCE_ENEMIES: Dict[int, List[Tuple[Entity, int]]] = {
     5: [(entity_factory.troll, 50)],
 }
 
+# The name of each prototype in entity_factory, which is how a FloorPlan refers to them
+PROTOTYPE_NAMES: Dict[Entity, str] = {
+    prototype: name
+    for name, prototype in vars(entity_factory).items()
+    if isinstance(prototype, Entity)
+}
+
 
 class RectangularRoom:
     def __init__(self, x: int, y: int, width: int, height: int):
@@ -107,106 +116,288 @@ def get_entities_at_random(
     return chosen_entities
 
 
-def generate_dungeon(
-    max_rooms: int,
+def propose_rooms(
+    rng: np.random.Generator,
+    count: int,
     room_min_size: int,
     room_max_size: int,
     map_width: int,
     map_height: int,
-    engine: Engine,
-) -> GameMap:
-    """Generate a new dungeon map"""
-    player = engine.player
-    dungeon = GameMap(engine, map_width, map_height, entities=[player])
-
-    rooms: List[RectangularRoom] = []
-
-    center_of_last_room = (0, 0)
-
-    for r in range(max_rooms):
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
+) -> np.ndarray:
+    """Return up to `count` randomly sized and placed candidate rooms, as rows of x1, y1, x2, y2
+
+    Candidates too big to fit on the map at all are dropped
+    """
+    widths = rng.integers(room_min_size, room_max_size, count, endpoint=True)
+    heights = rng.integers(room_min_size, room_max_size, count, endpoint=True)
+
+    # Have a chance for a very different size room
+    very_different = rng.random(count) > 0.95
+    mods = rng.integers(2, 3, count, endpoint=True) * rng.choice([-1, 1], count)
+    # Ensure we keep a minimum size to generate
+    widths = np.where(very_different, np.maximum(2, widths * mods), widths)
+    heights = np.where(very_different, np.maximum(2, heights * mods), heights)
+
+    # Drop any too big to fit on this (likely small) map at all
+    fits = (widths < map_width) & (heights < map_height)
+    widths, heights = widths[fits], heights[fits]
+
+    xs = rng.integers(0, map_width - widths - 1, endpoint=True)
+    ys = rng.integers(0, map_height - heights - 1, endpoint=True)
+    return np.stack([xs, ys, xs + widths, ys + heights], axis=1)
+
+
+def select_rooms(candidates: np.ndarray, map_width: int, map_height: int) -> np.ndarray:
+    """Return the candidates that don't intersect an earlier kept candidate, as RectangularRoom.intersects would
+
+    Instead of checking each candidate against every kept room, kept rooms are marked in an occupancy mask.
+    A summed-area table of that mask rejects most candidates a whole batch at a time, and only the rest
+    are checked one by one.
+    """
+    # A candidate intersects a kept room if its x1..x2 overlaps the room's x1..x2-1, and its y1..y2 the room's y1..y2
+    occupied = np.zeros((map_width, map_height), dtype=bool)
+    summed = np.zeros((map_width + 1, map_height + 1), dtype=np.int32)
+    kept: List[int] = []
+    start = 0
+    batch_size = 64
+    while start < len(candidates):
+        batch = candidates[start : start + batch_size]
+        x1, y1, x2, y2 = batch.T
+        overlap = (
+            summed[x2 + 1, y2 + 1]
+            - summed[x1, y2 + 1]
+            - summed[x2 + 1, y1]
+            + summed[x1, y1]
+        )
 
-        # Have a chance for a very different size room
+        # The table doesn't include rooms kept during this batch, so check what's left against the mask
+        survivors = np.flatnonzero(overlap == 0)
+        for i, (room_x1, room_y1, room_x2, room_y2) in zip(
+            survivors.tolist(), batch[survivors].tolist()
+        ):
+            if not occupied[room_x1 : room_x2 + 1, room_y1 : room_y2 + 1].any():
+                occupied[room_x1:room_x2, room_y1 : room_y2 + 1] = True
+                kept.append(start + i)
+
+        start += len(batch)
+        if start < len(candidates) and len(survivors):
+            np.cumsum(occupied, axis=0, dtype=np.int32, out=summed[1:, 1:])
+            np.cumsum(summed[1:, 1:], axis=1, out=summed[1:, 1:])
+        # Later batches are mostly rejected, so check more at once
+        batch_size *= 2
+
+    return candidates[kept]
+
+
+class FloorPlan:
+    """Everything random about a new floor, worked out without touching the live game
+
+    Entities are listed by their name in entity_factory, so a plan is small and can be made in another process
+    """
+
+    def __init__(self, floor_number: int, width: int, height: int):
+        self.floor_number = floor_number
+        self.width, self.height = width, height
+        self.palette = tile_types.make_palette()
+        self.tile_ids = np.full(
+            (width, height), fill_value=tile_types.WALL, dtype=np.uint8, order="F"
+        )
+        self.player_start: Optional[Tuple[int, int]] = None
+        self.downstairs_location = (0, 0)
+        # Name of each entity_factory prototype to spawn, and where, in order
+        self.spawns: List[Tuple[str, int, int]] = []
+        self.show_entire_map = False
+        # None to keep the player's current light
+        self.light_radius: Optional[int] = None
+        self.bar_color = (255, 255, 255)
+
+
+def plan_floor(world_seed: int, floor_number: int) -> FloorPlan:
+    """Work out the given floor of a game, which is always the same for the same seed and floor
+
+    The random module is seeded just for the floor, then put back how it was, so the result doesn't depend on
+    anything else that happened in the game, or which process it's made in
+    """
+    previous_state = random.getstate()
+    random.seed(f"{world_seed}:{floor_number}")
+    try:
+        return _plan_floor(floor_number)
+    finally:
+        random.setstate(previous_state)
+
+
+def _plan_floor(floor_number: int) -> FloorPlan:
+    # Customize how our tiles look (symbols and colors)
+    tile_types.generate_tiles()
+    map_width = general.MAP_WIDTH
+    map_height = general.MAP_HEIGHT
+
+    # Note for the room cap, if a room intersects we skip it, so it's okay to have a potential lot here
+    max_rooms = math.ceil(map_width * map_height / random.randint(5, 80))
+    room_min_size = random.randint(2, 6)
+    room_max_size = room_min_size + random.randint(2, 5)
+
+    show_entire_map = False
+    light_radius = None
+    # Some of the crazier options only happen after they have a normal floor, to give a bit of a fair/consistent start
+    if floor_number > 1:
+        # Have a chance for a smaller map after the first floor
+        if random.random() > 0.75:
+            map_width = random.randint(general.MAP_WIDTH // 4, general.MAP_WIDTH)
+            # Sized as if the HUD were part of the map, as it was when maps were always the size of the console
+            full_height = general.MAP_HEIGHT + general.HUD_SIZE
+            map_height = max(
+                random.randint(full_height // 4, full_height) - general.HUD_SIZE,
+                general.HUD_SIZE * 2,
+            )
+
+        # Sometimes get no fog of war...black sheep wall
+        show_entire_map = random.random() > 0.9
+
+        # TODO Randomize our light radius per floor for fun - should eventually dwindle over time as a resource?
+        # And of course the chance for something REALLY wild, that almost looks like a bug haha
         if random.random() > 0.95:
-            mod = random.randint(2, 3) * random.choice([-1, 1])
-            room_width *= mod
-            room_height *= mod
-            # Ensure we keep a minimum size to generate
-            room_width = max(2, room_width)
-            room_height = max(2, room_height)
+            light_radius = random.randint(10, 20)
+        else:
+            light_radius = random.randint(2, 5)
 
-        x = random.randint(0, dungeon.width - room_width - 1)
-        y = random.randint(0, dungeon.height - room_height - 1)
+    bar_color = colors.generate_color()
 
-        # "RectangularRoom" class makes rectangles easier to work with
-        new_room = RectangularRoom(x, y, room_width, room_height)
+    plan = plan_dungeon(
+        max_rooms=max_rooms,
+        room_min_size=room_min_size,
+        room_max_size=room_max_size,
+        map_width=map_width,
+        map_height=map_height,
+        floor_number=floor_number,
+    )
+    plan.show_entire_map = show_entire_map
+    plan.light_radius = light_radius
+    plan.bar_color = bar_color
+    return plan
 
-        # Run through the other rooms and see if they intersect with this one
-        if any(new_room.intersects(other_room) for other_room in rooms):
-            continue  # This room intersects, so go to the next attempt
-        # If there are no intersections then the room is valid
 
+def plan_dungeon(
+    max_rooms: int,
+    room_min_size: int,
+    room_max_size: int,
+    map_width: int,
+    map_height: int,
+    floor_number: int,
+) -> FloorPlan:
+    """Lay out the rooms, tunnels and entities of a new dungeon map"""
+    plan = FloorPlan(floor_number, map_width, map_height)
+
+    # Seeded from the random module, so a seeded game still generates the same floors
+    rng = np.random.default_rng(random.getrandbits(64))
+    candidates = propose_rooms(
+        rng, max_rooms, room_min_size, room_max_size, map_width, map_height
+    )
+    # "RectangularRoom" class makes rectangles easier to work with
+    rooms = [
+        RectangularRoom(x1, y1, x2 - x1, y2 - y1)
+        for x1, y1, x2, y2 in select_rooms(candidates, map_width, map_height).tolist()
+    ]
+
+    # Move horizontally or vertically first along each tunnel
+    horizontal_first = (rng.random(len(rooms)) < 0.5).tolist()
+
+    # Mark every room and tunnel in a plain boolean mask, then lay all the floor tiles at once
+    floor = np.zeros((map_width, map_height), dtype=bool)
+    # Locations that already have an entity, so two aren't spawned on top of each other
+    occupied: Set[Tuple[int, int]] = set()
+    center_of_last_room = (0, 0)
+
+    for i, room in enumerate(rooms):
         # Dig out this rooms inner area
-        dungeon.tiles[new_room.inner] = tile_types.floor
+        floor[room.inner] = True
 
-        if len(rooms) == 0:
+        if i == 0:
             # The first room, where the player starts
-            player.place(*new_room.center, dungeon)
-            entity_factory.stairs_up.spawn(dungeon, *new_room.center)
+            plan.player_start = room.center
+            plan.spawns.append(("stairs_up", *room.center))
+            occupied.add(room.center)
         else:  # All rooms after the first
             # Dig out a tunnel between this room and the previous one
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.floor
+            for tunnel in tunnel_between(
+                rooms[i - 1].center, room.center, horizontal_first[i]
+            ):
+                floor[tunnel] = True
 
-            center_of_last_room = new_room.center
+            center_of_last_room = room.center
 
-        place_entities(new_room, dungeon, engine.game_world.current_floor)
+        place_entities(room, plan, occupied)
 
-        # Finally, append the new room to the list
-        rooms.append(new_room)
+    plan.tile_ids[floor] = tile_types.FLOOR
 
     # Place our stairs down
-    dungeon.tiles[center_of_last_room] = tile_types.down_stairs
-    dungeon.downstairs_location = center_of_last_room
+    plan.tile_ids[center_of_last_room] = tile_types.DOWN_STAIRS
+    plan.downstairs_location = center_of_last_room
+
+    return plan
+
+
+def build_floor(plan: FloorPlan, engine: Engine) -> GameMap:
+    """Create the GameMap for a planned floor, and put the player and the planned entities on it"""
+    dungeon = GameMap(engine, plan.width, plan.height)
+    dungeon.palette = plan.palette
+    dungeon.tile_ids = plan.tile_ids
+    dungeon.downstairs_location = plan.downstairs_location
+
+    # The player is added to the map when they're placed in the first room, on the stairs up
+    if plan.player_start:
+        dungeon.upstairs_location = plan.player_start
+        engine.player.place(*plan.player_start, dungeon)
+    for name, x, y in plan.spawns:
+        getattr(entity_factory, name).spawn(dungeon, x, y)
 
     return dungeon
 
 
-def place_entities(room: RectangularRoom, dungeon: GameMap, floor_number: int) -> None:
+def place_entities(
+    room: RectangularRoom, plan: FloorPlan, occupied: Set[Tuple[int, int]]
+) -> None:
     number_of_monsters = random.randint(
-        0, get_max_value_for_floor(MAX_MONSTERS_BY_FLOOR, floor_number)
+        0, get_max_value_for_floor(MAX_MONSTERS_BY_FLOOR, plan.floor_number)
     )
     number_of_items = random.randint(
-        0, get_max_value_for_floor(MAX_ITEMS_BY_FLOOR, floor_number)
+        0, get_max_value_for_floor(MAX_ITEMS_BY_FLOOR, plan.floor_number)
     )
     monsters: List[Entity] = get_entities_at_random(
-        CHANCE_ENEMIES, number_of_monsters, floor_number
+        CHANCE_ENEMIES, number_of_monsters, plan.floor_number
     )
     items: List[Entity] = get_entities_at_random(
-        CHANCE_ITEMS, number_of_items, floor_number
+        CHANCE_ITEMS, number_of_items, plan.floor_number
     )
 
     for entity in monsters + items:
         x = random.randint(room.x1 + 1, room.x2 - 1)
         y = random.randint(room.y1 + 1, room.y2 - 1)
 
-        if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
-            entity.spawn(dungeon, x, y)
+        if (x, y) not in occupied:
+            plan.spawns.append((PROTOTYPE_NAMES[entity], x, y))
+            occupied.add((x, y))
 
 
 def tunnel_between(
-    start: Tuple[int, int], end: Tuple[int, int]
-) -> Iterator[Tuple[int, int]]:
-    """Return an L-shaped tunnel between these two points."""
+    start: Tuple[int, int], end: Tuple[int, int], horizontal_first: bool
+) -> Tuple[Tuple[slice, slice], Tuple[slice, slice]]:
+    """Return an L-shaped tunnel between these two points, as the 2D array index of each leg"""
     x1, y1 = start
     x2, y2 = end
 
     # Move horizontally or vertically first then the opposite
-    corner_x, corner_y = (x2, y1) if random.random() < 0.5 else (x1, y2)
+    corner_x, corner_y = (x2, y1) if horizontal_first else (x1, y2)
+
+    return (
+        _straight_line(x1, y1, corner_x, corner_y),
+        _straight_line(corner_x, corner_y, x2, y2),
+    )
+
 
-    # Generate the coordinates for this tunnel
-    for x, y in tcod.los.bresenham((x1, y1), (corner_x, corner_y)).tolist():
-        yield x, y
-    for x, y in tcod.los.bresenham((corner_x, corner_y), (x2, y2)).tolist():
-        yield x, y
+def _straight_line(x1: int, y1: int, x2: int, y2: int) -> Tuple[slice, slice]:
+    """Return the tiles from one point to another in the same row or column, as a 2D array index"""
+    return (
+        slice(min(x1, x2), max(x1, x2) + 1),
+        slice(min(y1, y2), max(y1, y2) + 1),
+    )
@@ -9,6 +9,7 @@ import tcod.event
 from tcod import libtcodpy
 
 import actions
+import profiler
 from actions import (
     Action,
     BumpAction,
@@ -93,6 +94,13 @@ class BaseEventHandler(tcod.event.EventDispatch[ActionOrHandler]):
     ) -> None:
         raise NotImplementedError()
 
+    def next_render_delay(self) -> Optional[float]:
+        """Seconds until this handler needs to render again even without input
+
+        None means nothing is animated, so only render again after input
+        """
+        return None
+
     def ev_quit(self, event: tcod.event.Quit) -> Optional[Action]:
         raise SystemExit()
 
@@ -121,14 +129,19 @@ class EventHandler(BaseEventHandler):
         if action and action.perform():
             self.engine.handle_enemy_turns()
             self.engine.update_fov()  # Update the FOV before the players next action
+            self.engine.turn_count += 1
             return True
         return False
 
     def ev_mousemotion(self, event: tcod.event.MouseMotion) -> None:
         x, y = event.position
+        x, y = self.engine.camera.to_map(int(x), int(y))
+
+        if self.engine.camera.is_on_screen(x, y):
+            self.engine.mouse_location = (x, y)
 
-        if self.engine.game_map.in_bounds(x, y):
-            self.engine.mouse_location = (int(x), int(y))
+    def next_render_delay(self) -> Optional[float]:
+        return self.engine.next_render_delay()
 
     def on_render(
         self, console: tcod.console.Console, context: tcod.context.Context
@@ -184,6 +197,9 @@ class HeroAttackHandler(EventHandler):
         )  # Whether we're filling up (+1) or down (-1)
         # TODO Could start weapon fill iter_count at a higher amount based on what floor we're on - lower floor is faster fill
 
+    def next_render_delay(self) -> Optional[float]:
+        return 0  # The weapon bar fills every frame
+
     def on_render(
         self, console: tcod.console.Console, context: tcod.context.Context
     ) -> None:
@@ -263,13 +279,14 @@ class MainGameEventHandler(EventHandler):
             action = WaitAction(player)
         elif key in ESCAPE_KEYS:
             action = EscapeAction(player)
-        # TODO Perform StairsUpAction once we have a multi-level dungeon
-        # elif key == tcod.event.KeySym.COMMA and modifier & (tcod.event.Modifier.LSHIFT | tcod.event.Modifier.RSHIFT):
-        #     action = StairsUpAction(player)
         if key == tcod.event.KeySym.PERIOD and modifier & (
             tcod.event.Modifier.LSHIFT | tcod.event.Modifier.RSHIFT
         ):
             return actions.TakeStairsAction(player)
+        elif key == tcod.event.KeySym.COMMA and modifier & (
+            tcod.event.Modifier.LSHIFT | tcod.event.Modifier.RSHIFT
+        ):
+            return actions.StairsUpAction(player)
         elif key == tcod.event.KeySym.G:
             action = PickupAction(player)
         elif key == tcod.event.KeySym.I:
@@ -282,6 +299,8 @@ class MainGameEventHandler(EventHandler):
             return LookHandler(self.engine)
         elif key == tcod.event.KeySym.V:
             return HistoryViewer(self.engine)
+        elif key == tcod.event.KeySym.F3:
+            profiler.toggle()  # Show or hide frame and turn timings
 
         return action
 
@@ -291,6 +310,8 @@ class GameOverEventHandler(EventHandler):
         """Handle exiting out of a finished game"""
         if os.path.exists(general.SAVE_FILE):
             os.remove(general.SAVE_FILE)  # Deletes the active save file
+        self.engine.message_log.journal.delete()
+        self.engine.game_world.floor_store.delete()
         raise QuitWithoutSaving()  # Avoid saving a finished game
 
     def ev_quit(self, event: tcod.event.Quit) -> None:
@@ -325,6 +346,9 @@ class PopupMessage(BaseEventHandler):
             alignment=libtcodpy.CENTER,
         )
 
+    def next_render_delay(self) -> Optional[float]:
+        return self.parent.next_render_delay()
+
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[BaseEventHandler]:
         """Any key returns to the parent handler"""
         return self.parent
@@ -385,7 +409,10 @@ class InventoryEventHandler(AskUserEventHandler):
         if height <= 3:
             height = 3
 
-        if self.engine.player.x <= 30:
+        player_x, _ = self.engine.camera.to_screen(
+            self.engine.player.x, self.engine.player.y
+        )
+        if player_x <= 30:
             x = 40
         else:
             x = 0
@@ -475,7 +502,7 @@ class SelectIndexHandler(AskUserEventHandler):
     ) -> None:
         """Highlight the tile under the cursor"""
         super().on_render(console, context)
-        x, y = self.engine.mouse_location
+        x, y = self.engine.camera.to_screen(*self.engine.mouse_location)
         console.rgb["bg"][x, y] = colors.white
         console.rgb["fg"][x, y] = colors.black
 
@@ -495,9 +522,10 @@ class SelectIndexHandler(AskUserEventHandler):
             dx, dy = MOVE_KEYS[key]
             x += dx * modifier
             y += dy * modifier
-            # Clamp the cursor index to the map size
-            x = max(0, min(x, self.engine.game_map.width - 1))
-            y = max(0, min(y, self.engine.game_map.height - 1))
+            # Clamp the cursor index to the part of the map on screen
+            camera = self.engine.camera
+            x = max(camera.x, min(x, camera.x + camera.view_width - 1))
+            y = max(camera.y, min(y, camera.y + camera.view_height - 1))
             self.engine.mouse_location = x, y
             return None
         elif key in CONFIRM_KEYS:
@@ -508,9 +536,10 @@ class SelectIndexHandler(AskUserEventHandler):
         self, event: tcod.event.MouseButtonDown
     ) -> Optional[ActionOrHandler]:
         """Left click confirms a selection"""
-        if self.engine.game_map.in_bounds(*event.tile):
+        x, y = self.engine.camera.to_map(*event.tile)
+        if self.engine.camera.is_on_screen(x, y):
             if event.button == 1:
-                return self.on_index_selected(*event.tile)
+                return self.on_index_selected(x, y)
         return super().ev_mousebuttondown(event)
 
     def on_index_selected(self, x: int, y: int) -> Optional[ActionOrHandler]:
@@ -553,7 +582,7 @@ class CrossRangedAttackHandler(SelectIndexHandler):
     ) -> None:
         """Highlight the tile under the cursor"""
         super().on_render(console, context)
-        x, y = self.engine.mouse_location
+        x, y = self.engine.camera.to_screen(*self.engine.mouse_location)
 
         # Convert our requested Unicode character to the int equivalent for use with our draw
         unicode_char_int = ord(self.char)
@@ -619,7 +648,7 @@ class AreaRangedAttackHandler(SelectIndexHandler):
     ) -> None:
         """Highlight the tile under the cursor"""
         super().on_render(console, context)
-        x, y = self.engine.mouse_location
+        x, y = self.engine.camera.to_screen(*self.engine.mouse_location)
 
         # Draw a square around the targeted area, so the player can see the affected tiles
         console.draw_frame(
@@ -653,7 +682,10 @@ class LevelUpEventHandler(AskUserEventHandler):
     ) -> None:
         super().on_render(console, context)
 
-        if self.engine.player.x <= 30:
+        player_x, _ = self.engine.camera.to_screen(
+            self.engine.player.x, self.engine.player.y
+        )
+        if player_x <= 30:
             x = 40
         else:
             x = 0
@@ -727,7 +759,10 @@ class CharacterScreenEventHandler(AskUserEventHandler):
     ) -> None:
         super().on_render(console, context)
 
-        if self.engine.player.x <= 30:
+        player_x, _ = self.engine.camera.to_screen(
+            self.engine.player.x, self.engine.player.y
+        )
+        if player_x <= 30:
             x = 40
         else:
             x = 0
@@ -783,7 +818,7 @@ class HistoryViewer(EventHandler):
 
     def __init__(self, engine: Engine):
         super().__init__(engine)
-        self.log_length = len(engine.message_log.messages)
+        self.log_length = len(engine.message_log)
         self.cursor = self.log_length - 1
 
     def on_render(
@@ -810,7 +845,8 @@ class HistoryViewer(EventHandler):
             1,
             log_console.width,
             log_console.height - 2,
-            self.engine.message_log.messages[: self.cursor + 1],
+            self.engine.message_log,
+            end=self.cursor + 1,
         )
         log_console.blit(console, 0, 0)
 
@@ -1,16 +1,19 @@
 #!/usr/bin/env python3
 
+import argparse
 import time
 import traceback
 
 import tcod
 
+import autosave
 import exceptions
 import input_handlers
+import prefetch
 import setup_game
 from constants import colors, general
 from exceptions import ImpossibleAction
-
+from recorder import Recorder
 
 # Can play with SDL rendering quality
 # os.environ["SDL_RENDER_SCALE_QUALITY"] = "best"
@@ -23,7 +26,26 @@ def save_game(handler: input_handlers.BaseEventHandler) -> None:
         print("Game saved")
 
 
+def discard_game(handler: input_handlers.BaseEventHandler) -> None:
+    """If the current event handler has an active Engine, delete the files it kept outside the save
+
+    For a game that's being quit without saving, so they aren't left behind
+    """
+    if isinstance(handler, input_handlers.EventHandler):
+        handler.engine.message_log.journal.delete()
+        handler.engine.game_world.floor_store.delete()
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Into the Dark")
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Record the next new game to a file, to replay with recorder.py",
+    )
+    args = parser.parse_args()
+    recorder = Recorder(args.record) if args.record else None
+
     # TODO Decide on a font/tileset, and likely allow customization
     # tileset = tcod.tileset.load_tilesheet("assets/dejavu10x10_gs_tc.png", 32, 8, tcod.tileset.CHARMAP_TCOD)
     # tileset = tcod.tileset.load_truetype_font("assets/cp437-12x24.ttf", 12, 24)
@@ -36,7 +58,7 @@ def main() -> None:
     # tileset = tcod.tileset.load_tilesheet("assets/Runeset_24x24.png", 16, 16, tcod.tileset.CHARMAP_CP437)
     # tileset = tcod.tileset.load_tilesheet("assets/Teeto_K_18x18.png", 16, 16, tcod.tileset.CHARMAP_CP437)
 
-    handler: input_handlers.BaseEventHandler = setup_game.MainMenu()
+    handler: input_handlers.BaseEventHandler = setup_game.MainMenu(recorder)
 
     with tcod.context.new(
         columns=general.WIDTH,
@@ -51,17 +73,22 @@ def main() -> None:
         # root_console = tcod.console.Console(rec_width+1, rec_height, order="F")
 
         root_console = tcod.console.Console(general.WIDTH, general.HEIGHT, order="F")
+        autosaver = autosave.Autosaver(
+            general.SAVE_FILE, general.AUTOSAVE_EVERY_N_TURNS
+        )
         frame_duration = 1 / general.FPS
         last_frame = time.time()
+        needs_render = True
 
         try:
             while True:
-                now = time.time()
-
-                if now - last_frame >= frame_duration:
-                    last_frame = now
+                if needs_render:
+                    last_frame = time.time()
+                    needs_render = False
                     root_console.clear()
                     handler.on_render(console=root_console, context=context)
+                    if recorder:
+                        recorder.frame()
 
                     context.present(
                         root_console,
@@ -70,30 +97,59 @@ def main() -> None:
                         clear_color=colors.MAP_BORDER_COLOR,
                     )
 
-                    try:
-                        for event in tcod.event.get():
-                            context.convert_event(event)
-                            handler = handler.handle_event(event)
-                    except ImpossibleAction as ia:
-                        if isinstance(handler, input_handlers.EventHandler):
-                            handler.engine.message_log.add_error(str(ia))
-                    except Exception:
-                        traceback.print_exc()
-                        # Then print the error to the message log
-                        if isinstance(handler, input_handlers.EventHandler):
-                            handler.engine.message_log.add_message(
-                                traceback.format_exc(), colors.error
-                            )
-
-                    time.sleep(max(0.0, frame_duration - (time.time() - now)))
+                # Sleep until there is input, or until the handler has something animated to show
+                render_delay = (
+                    0 if general.ALWAYS_RENDER else handler.next_render_delay()
+                )
+                timeout = (
+                    None if render_delay is None else max(render_delay, frame_duration)
+                )
+
+                try:
+                    for event in tcod.event.wait(timeout):
+                        context.convert_event(event)
+                        needs_render = True
+                        if recorder:
+                            recorder.event(event)
+                        handler = handler.handle_event(event)
+                except ImpossibleAction as ia:
+                    if isinstance(handler, input_handlers.EventHandler):
+                        handler.engine.message_log.add_error(str(ia))
+                except Exception:
+                    traceback.print_exc()
+                    # Then print the error to the message log
+                    if isinstance(handler, input_handlers.EventHandler):
+                        handler.engine.message_log.add_message(
+                            traceback.format_exc(), colors.error
+                        )
+
+                if isinstance(handler, input_handlers.EventHandler):
+                    autosaver.on_turn_boundary(handler.engine)
+
+                render_delay = handler.next_render_delay()
+                if general.ALWAYS_RENDER or (
+                    render_delay is not None and render_delay <= 0
+                ):
+                    needs_render = True
+
+                if needs_render:
+                    # Still cap how often we draw, such as when the mouse is moving constantly
+                    time.sleep(max(0.0, frame_duration - (time.time() - last_frame)))
         except exceptions.QuitWithoutSaving:
-            pass
+            autosaver.stop()
+            discard_game(handler)
         except SystemExit:  # Save and quit
+            autosaver.stop()  # So an older autosave can't land after this save
             save_game(handler)
             raise
         except BaseException:  # Save on any other unexpected exception
+            autosaver.stop()
             save_game(handler)
             raise
+        finally:
+            prefetch.shutdown()
+            if recorder:
+                recorder.close()
 
 
 if __name__ == "__main__":
@@ -1,12 +1,19 @@
-from typing import Iterable, List, Reversible, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import os
+import pickle
 import textwrap
+import zlib
 
 import tcod
 
-from constants import colors
+import profiler
+from constants import colors, general
 
 
 class Message:
+    # The full text wrapped as (width, count, lines), as the log is drawn every frame but rarely changes
+    _wrapped: Optional[Tuple[int, int, List[str]]] = None
+
     def __init__(self, text: str, fg: Tuple[int, int, int]):
         self.plain_text = text
         self.fg = fg
@@ -19,10 +26,158 @@ class Message:
             return f"{self.plain_text} (x{self.count})"
         return self.plain_text
 
+    def wrapped(self, width: int) -> List[str]:
+        """Return the full text wrapped to the given width, only wrapping it again if the width or count changed"""
+        wrapped = self._wrapped
+        if wrapped is None or wrapped[0] != width or wrapped[1] != self.count:
+            lines = list(MessageLog.wrap(self.full_text, width))
+            wrapped = self._wrapped = (width, self.count, lines)
+        return wrapped[2]
+
+
+class MessageJournal:
+    """The older messages of a log, appended to a file a page at a time and read back a page at a time
+
+    Each page is a compressed pickle of the game's key and (text, fg, count) records, and `page_offsets` holds where
+    each one starts, with a final entry for where the last one ends. A page with a different key is from another game,
+    so its messages are shown as lost
+
+    Until the game is saved the file is named after MESSAGE_JOURNAL_FILE, with a random token added so no other game
+    writes to it. Saving moves it next to the save, see `move_to`. The file is only created once the first page is
+    appended, and a game quit without saving deletes it, see main.discard_game
+    """
+
+    def __init__(
+        self,
+        filename: Optional[str] = None,
+        page_offsets: Sequence[int] = (0,),
+        key: Any = None,
+    ):
+        if filename is None:
+            root, extension = os.path.splitext(general.MESSAGE_JOURNAL_FILE)
+            filename = f"{root}.{os.urandom(4).hex()}{extension}"
+        self.filename = filename
+        self.page_offsets = list(page_offsets)
+        # Tells this game's pages apart from another's, see GameWorld.game_key
+        self.key = key
+        # Recently read pages, so scrolling through the history doesn't read the file every frame
+        self._pages: Dict[int, List[Message]] = {}
+
+    def __len__(self) -> int:
+        return (len(self.page_offsets) - 1) * general.MESSAGE_JOURNAL_PAGE_SIZE
+
+    def __getitem__(self, index: int) -> Message:
+        page_number, position = divmod(index, general.MESSAGE_JOURNAL_PAGE_SIZE)
+        return self._read_page(page_number)[position]
+
+    def append_page(self, messages: List[Message]) -> None:
+        """Write a full page of messages to the end of the journal"""
+        records = [
+            (message.plain_text, message.fg, message.count) for message in messages
+        ]
+        data = zlib.compress(
+            pickle.dumps(
+                {"key": self.key, "records": records},
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        )
+
+        end = self.page_offsets[-1]
+        # Anything past the end was written after the save this journal was loaded with, so is replaced
+        exists = end and os.path.exists(self.filename)
+        with open(self.filename, "r+b" if exists else "wb") as f:
+            f.seek(end)
+            f.write(data)
+            f.truncate()
+        self.page_offsets.append(end + len(data))
+
+    def move_to(self, filename: str) -> None:
+        """Keep the journal in the given file from now on, such as one named after the save it goes with"""
+        if filename == self.filename:
+            return
+        if os.path.exists(self.filename):
+            os.replace(self.filename, filename)
+        elif os.path.exists(filename):
+            os.remove(filename)  # The journal of the save being replaced
+        self.filename = filename
+
+    def _unpack_page(self, data: bytes) -> Optional[List[tuple]]:
+        """Return the records of a page, or None if it isn't a whole page of this game"""
+        decompressor = zlib.decompressobj()
+        try:
+            page = pickle.loads(decompressor.decompress(data))
+        except (zlib.error, pickle.UnpicklingError, EOFError):
+            return None
+        if not decompressor.eof or decompressor.unused_data:
+            return None  # Part of a page, or more than one
+        if isinstance(page, list) and self.key is None:
+            return page  # Saves from before pages had a key only have the records
+        if not isinstance(page, dict) or page.get("key") != self.key:
+            return None
+        return page["records"]
+
+    def _read_page(self, page_number: int) -> List[Message]:
+        page = self._pages.get(page_number)
+        if page is None:
+            start, end = self.page_offsets[page_number : page_number + 2]
+            try:
+                with open(self.filename, "rb") as f:
+                    f.seek(start)
+                    records = self._unpack_page(f.read(end - start))
+            except OSError:
+                records = None
+            if records is None:
+                # Such as the journal being deleted, or overwritten by another game
+                lost = ("(This message was lost)", colors.error, 1)
+                records = [lost] * general.MESSAGE_JOURNAL_PAGE_SIZE
+
+            page = []
+            for text, fg, count in records:
+                message = Message(text, fg)
+                message.count = count
+                page.append(message)
+
+            # Enough for a screen of history that spans two pages
+            if len(self._pages) >= 2:
+                del self._pages[next(iter(self._pages))]
+            self._pages[page_number] = page
+        return page
+
+    def delete(self) -> None:
+        """Delete the journal file, such as when the game is over"""
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        self.page_offsets = [0]
+        self._pages.clear()
+
 
 class MessageLog:
+    """Every message of the game, with the most recent in memory and older ones moved to a journal on disk
+
+    Indexing and len() cover the whole history, oldest first, while `messages` only holds the recent ones
+    """
+
     def __init__(self) -> None:
         self.messages: List[Message] = []
+        self.journal = MessageJournal()
+
+    def __len__(self) -> int:
+        return len(self.journal) + len(self.messages)
+
+    def __getitem__(self, index: int) -> Message:
+        """Return a message from anywhere in the history, where older messages are read from the journal"""
+        if index < len(self.journal):
+            return self.journal[index]
+        return self.messages[index - len(self.journal)]
+
+    def append(self, message: Message) -> None:
+        """Add a message to the end of the history, moving the oldest page to the journal once there are enough"""
+        self.messages.append(message)
+
+        page_size = general.MESSAGE_JOURNAL_PAGE_SIZE
+        if len(self.messages) >= general.MESSAGE_LOG_MEMORY + page_size:
+            self.journal.append_page(self.messages[:page_size])
+            del self.messages[:page_size]
 
     def add_error(self, text: str) -> None:
         self.add_message(text, colors.error)
@@ -41,8 +196,9 @@ class MessageLog:
         if stack and self.messages and text == self.messages[-1].plain_text:
             self.messages[-1].count += 1
         else:
-            self.messages.append(Message(text, fg))
+            self.append(Message(text, fg))
 
+    @profiler.timed("MessageLog.render")
     def render(
         self,
         console: tcod.console.Console,
@@ -74,15 +230,17 @@ class MessageLog:
         y: int,
         width: int,
         height: int,
-        messages: Reversible[Message],
+        messages: Sequence[Message],
+        end: Optional[int] = None,
     ) -> None:
         """Render the messages provided
-        The `messages` are rendered starting at the last message and working backwards
+        The `messages` are rendered starting at the last message, or the one before `end`, and working backwards
         """
         y_offset = height - 1
 
-        for message in reversed(messages):
-            for line in reversed(list(cls.wrap(message.full_text, width))):
+        for index in reversed(range(len(messages) if end is None else end)):
+            message = messages[index]
+            for line in reversed(message.wrapped(width)):
                 console.print(x=x, y=y + y_offset, string=line, fg=message.fg)
                 y_offset -= 1
                 if y_offset < 0:
@@ -0,0 +1,57 @@
+"""Plans upcoming floors in a worker process, so taking the stairs doesn't have to wait for generation
+
+Plans are seeded by the world seed and floor number, so a prefetched floor is identical to one planned on the spot
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, TYPE_CHECKING
+
+from constants import general
+
+if TYPE_CHECKING:
+    from gen_map import FloorPlan
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def submit(world_seed: int, floor_number: int) -> Optional[Future]:
+    """Start planning a floor in the background, or return None if prefetching is off or unavailable"""
+    global _executor
+    if not general.PREFETCH_NEXT_FLOOR:
+        return None
+
+    from gen_map import plan_floor
+
+    try:
+        if _executor is None:
+            # Spawn a fresh interpreter, rather than forking one with SDL and the game already loaded
+            _executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor.submit(plan_floor, world_seed, floor_number)
+    except Exception:
+        traceback.print_exc()  # Print to stderr, and carry on generating floors synchronously
+        return None
+
+
+def result(future: Optional[Future]) -> Optional[FloorPlan]:
+    """Wait for a submitted plan, or return None if it failed so the caller can plan it synchronously"""
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception:
+        traceback.print_exc()
+        return None
+
+
+def shutdown() -> None:
+    """Stop the worker process, abandoning any plan that hasn't started"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
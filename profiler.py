@@ -0,0 +1,64 @@
+"""Times the parts of each frame and turn, for the profiler overlay toggled in game
+
+Only collects timings while the overlay is showing, so it costs next to nothing otherwise
+"""
+
+from __future__ import annotations
+
+import functools
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Tuple, TypeVar
+
+import numpy as np  # type: ignore
+
+from constants import general
+
+F = TypeVar("F", bound=Callable)
+
+enabled = False
+# The latest durations in seconds of each timed function, by name, in the order they were first timed
+_samples: Dict[str, Deque[float]] = {}
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorate a function so how long it takes is recorded under the given name"""
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def record(name: str, seconds: float) -> None:
+    samples = _samples.get(name)
+    if samples is None:
+        samples = _samples[name] = deque(maxlen=general.PROFILER_SAMPLES)
+    samples.append(seconds)
+
+
+def toggle() -> None:
+    """Show or hide the overlay, starting with fresh timings each time it's shown"""
+    global enabled
+    enabled = not enabled
+    _samples.clear()
+
+
+def summary() -> List[Tuple[str, float, float, float]]:
+    """Return the name, p50, p95 and max in milliseconds of each timed function"""
+    rows = []
+    for name, samples in _samples.items():
+        p50, p95, worst = np.percentile(samples, (50, 95, 100)) * 1000
+        rows.append((name, p50, p95, worst))
+    return rows
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Record a new game's seed and input, then replay it headlessly as fast as possible
+
+Record a game with: python main.py --record session.rec
+Replay it with:     python recorder.py session.rec
+
+A recording is the seed the game was started with, then every input event and frame in the order they happened
+Frames are included as some handlers change on each one, like how full the HeroAttackHandler weapon bar is
+Replays end with a digest of the game, so two replays (such as before and after an optimization) can be compared
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import gzip
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+import traceback
+from typing import Any, BinaryIO, Iterator, Optional, Tuple
+
+import tcod
+
+import exceptions
+import input_handlers
+import prefetch
+import profiler
+import setup_game
+from constants import colors, general
+from engine import Engine
+
+RECORDING_VERSION = 1
+
+
+class Recorder:
+    """Writes a recording of a game, once it's been started with the game's seed"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file: Optional[BinaryIO] = None
+        self._pending_frames = 0  # Frames in a row are written as a single count
+
+    def start(self, seed: int) -> None:
+        """Start recording a new game, replacing any game already recorded"""
+        self.close()
+        self._file = gzip.open(self.filename, "wb")
+        self._write({"version": RECORDING_VERSION, "seed": seed})
+
+    def frame(self) -> None:
+        if self._file:
+            self._pending_frames += 1
+
+    def event(self, event: tcod.event.Event) -> None:
+        """Record an event, which should be called just before the event is handled"""
+        if self._file:
+            # Drop the underlying SDL event, which can't be pickled and isn't used by the game
+            event = copy.copy(event)
+            event.sdl_event = None
+            self._write(event)
+
+    def close(self) -> None:
+        if self._file:
+            self._write(None)  # Marks the recording as complete
+            self._file.close()
+            self._file = None
+
+    def _write(self, record: Any) -> None:
+        if self._pending_frames:
+            pickle.dump(self._pending_frames, self._file, pickle.HIGHEST_PROTOCOL)
+            self._pending_frames = 0
+        pickle.dump(record, self._file, pickle.HIGHEST_PROTOCOL)
+
+
+def read_recording(filename: str) -> Tuple[int, Iterator[Any]]:
+    """Return the seed of a recording, and an iterator of its records
+
+    Each record is either a number of frames to render, or an event to handle
+    """
+    f = gzip.open(filename, "rb")
+    header = pickle.load(f)
+    if header.get("version", 0) > RECORDING_VERSION:
+        raise ValueError(f"Recording version {header['version']} isn't supported")
+
+    def records() -> Iterator[Any]:
+        with f:
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    return  # The game didn't close the recording, such as after a crash
+                if record is None:
+                    return
+                yield record
+
+    return header["seed"], records()
+
+
+def game_digest(engine: Engine) -> str:
+    """Return a hash of the state of a game, which should match between replays of the same recording"""
+    player = engine.player
+    state = [
+        engine.game_world.current_floor,
+        engine.turn_count,
+        player.fighter.hp,
+        player.level.current_xp,
+        engine.game_map.tile_ids.tobytes(),
+        engine.game_map.explored.bits.tobytes(),
+        sorted(
+            (entity.name, entity.x, entity.y, getattr(entity, "is_alive", None))
+            for entity in engine.game_map.entities
+        ),
+        [
+            (message.plain_text, message.count)
+            for message in engine.message_log.messages
+        ],
+    ]
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+def replay(filename: str) -> Engine:
+    """Replay a recording as fast as possible, and return the Engine it ended with"""
+    seed, records = read_recording(filename)
+    engine = setup_game.new_game(seed)
+    handler: input_handlers.BaseEventHandler = input_handlers.MainGameEventHandler(
+        engine
+    )
+    console = tcod.console.Console(general.WIDTH, general.HEIGHT, order="F")
+
+    try:
+        for record in records:
+            if isinstance(record, int):
+                for _ in range(record):
+                    console.clear()
+                    handler.on_render(console=console, context=None)
+                continue
+
+            # Handled just like the main loop in main.py does
+            try:
+                handler = handler.handle_event(record)
+            except exceptions.ImpossibleAction as ia:
+                if isinstance(handler, input_handlers.EventHandler):
+                    handler.engine.message_log.add_error(str(ia))
+            except (exceptions.QuitWithoutSaving, SystemExit):
+                break
+            except Exception:
+                traceback.print_exc()
+                if isinstance(handler, input_handlers.EventHandler):
+                    handler.engine.message_log.add_message(
+                        traceback.format_exc(), colors.error
+                    )
+    finally:
+        records.close()
+
+    return engine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="File recorded with main.py --record")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Also report the p50/p95/max of each profiled function",
+    )
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.toggle()
+
+    # Anything the game writes, like the message journal, floor store or deleting the save on game over, stays out of the way
+    with tempfile.TemporaryDirectory(prefix="into_the_dark_replay_") as directory:
+        general.SAVE_FILE = os.path.join(directory, general.SAVE_FILE)
+        general.MESSAGE_JOURNAL_FILE = os.path.join(
+            directory, general.MESSAGE_JOURNAL_FILE
+        )
+        general.FLOOR_STORE_FILE = os.path.join(directory, general.FLOOR_STORE_FILE)
+        start = time.perf_counter()
+        try:
+            engine = replay(args.recording)
+        finally:
+            prefetch.shutdown()
+        elapsed = time.perf_counter() - start
+
+        report = [
+            f"Elapsed:             {elapsed:.3f} s",
+            f"Turns:               {engine.turn_count} ({engine.turn_count / elapsed if elapsed else 0:.1f}/s)",
+            f"Ended on floor {engine.game_world.current_floor}"
+            f"{'' if engine.player.is_alive else ', the player died'}",
+            f"Digest:              {game_digest(engine)}",
+        ]
+        for name, p50, p95, worst in profiler.summary():
+            report.append(
+                f"{name + ':':<21}p50 {p50:.3f} ms, p95 {p95:.3f} ms, max {worst:.3f} ms"
+            )
+        print("\n".join(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ from typing import Optional, TYPE_CHECKING
 
 import tcod
 
+import profiler
 from constants import colors, general
 
 if TYPE_CHECKING:
@@ -19,7 +20,7 @@ def get_names_at_location(x: int, y: int, game_map: GameMap) -> Optional[str]:
     # For clarity do a few steps to get our entity names for viewing
     # We want to put the highest RenderOrder first in the list
     # Also put an (x2) or similar counter in the rare case of multiples on the same tile
-    entities_here = [e for e in game_map.entities if e.x == x and e.y == y]
+    entities_here = game_map.get_entities_at_location(x, y)
     if entities_here:
         entities_sorted = sorted(
             entities_here, key=lambda e: e.render_order.value, reverse=True
@@ -78,6 +79,18 @@ def render_dungeon_level(console: tcod.console.Console, dungeon_level: int) -> N
     )
 
 
+def render_profiler(console: tcod.console.Console) -> None:
+    """
+    Render the p50, p95 and max timings of each profiled function over the top left of the map
+    """
+    lines = [f"{'Profiler (ms)':<20}{'p50':>8}{'p95':>8}{'max':>8}"]
+    for name, p50, p95, worst in profiler.summary():
+        lines.append(f"{name:<20}{p50:>8.2f}{p95:>8.2f}{worst:>8.2f}")
+
+    for y, line in enumerate(lines):
+        console.print(x=0, y=y, string=line, fg=colors.white, bg=colors.black)
+
+
 def render_names_at_mouse_location(
     console: tcod.console.Console, engine: Engine, x: int, y: int
 ) -> None:
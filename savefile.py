@@ -0,0 +1,456 @@
+"""Read and write save files
+
+A save file is a small uncompressed header (magic bytes and format version) followed by a gzip stream of:
+1. A pickled dict of the Engine, GameWorld and GameMap settings, and the shape/dtype of each map array
+2. The raw bytes of each map array (palette, tile ids, and the packed bits of visible and explored), copied straight to
+   and from the NumPy buffers
+3. The player, then every other entity on the map, each pickled as its own record
+4. The recent messages kept in memory, as batches of (text, fg, count) records
+
+Older messages aren't in the save at all, they stay in the message journal file next to it and named after it, see
+MessageJournal
+Neither are the floors the player has left, they're packed into the floor store file next to it, see FloorStore
+
+Records are written and read one at a time, so neither saving nor loading holds a second copy of the game in memory
+
+Saves from before this format existed (a whole pickled Engine compressed with LZMA) can still be loaded
+
+Files are written next to the real save and renamed over it, so a crash mid-save never leaves a broken save behind
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import lzma
+import os
+import pickle
+import struct
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np  # type: ignore
+
+from bitmask import BitMask
+from engine import Engine
+from constants import general
+from entity import Actor, Entity
+from floor_store import FloorStore
+from game_map import GameMap, GameWorld
+from message_log import Message, MessageJournal
+
+MAGIC = b"INTODARK"
+# 2 stores tiles as a palette and tile ids, instead of full tile types
+# 3 stores the visible and explored masks packed eight tiles to a byte, instead of a bool per tile
+SAVE_VERSION = 3
+HEADER = struct.Struct("<8sH")
+LEGACY_LZMA_MAGIC = b"\xfd7zXZ"
+
+COMPRESS_LEVEL = 1  # Favour speed, as the map arrays compress well regardless
+CHUNK_SIZE = 1024 * 1024  # How many bytes of an array to copy at once
+MESSAGE_BATCH_SIZE = 1000  # Messages are small, so pickle them in groups
+
+JOURNAL_EXTENSION = ".journal"
+FLOOR_STORE_EXTENSION = ".floors"
+
+MAP_ARRAYS = ("palette", "tile_ids", "visible", "explored")
+# Map arrays that are a BitMask, of which only the packed bits are saved
+MAP_MASKS = ("visible", "explored")
+
+
+class UnsupportedSaveVersion(Exception):
+    """Raised when a save file was written by a newer version of the game"""
+
+
+def _public_state(obj: Any, exclude: Iterable[str]) -> Dict[str, Any]:
+    """Return the attributes of an object worth saving, skipping private caches and anything saved separately"""
+    exclude = set(exclude)
+    return {
+        key: value
+        for key, value in vars(obj).items()
+        if not key.startswith("_") and key not in exclude
+    }
+
+
+class _RecordPickler(pickle.Pickler):
+    """Pickles a single record, referring to the shared game objects by name instead of including them
+
+    A new pickler is used per record so that each one is independent, and the memo doesn't keep growing
+    """
+
+    def __init__(self, file: BinaryIO, engine: Engine, game_map: GameMap, record: Any):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.engine = engine
+        self.game_map = game_map
+        self.record = record
+
+    def persistent_id(self, obj: Any) -> Any:
+        if obj is self.engine:
+            return "engine"
+        if obj is self.game_map:
+            return "game_map"
+        if obj is self.engine.player and obj is not self.record:
+            return "player"
+        return None
+
+
+class _RecordUnpickler(pickle.Unpickler):
+    def __init__(self, file: BinaryIO, engine: Engine, game_map: GameMap):
+        super().__init__(file)
+        self.engine = engine
+        self.game_map = game_map
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid == "engine":
+            return self.engine
+        if pid == "game_map":
+            return self.game_map
+        if pid == "player":
+            return self.engine.player
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid!r}")
+
+
+def _pickle_record(engine: Engine, game_map: GameMap, record: Any) -> bytes:
+    stream = io.BytesIO()
+    _RecordPickler(stream, engine, game_map, record).dump(record)
+    return stream.getvalue()
+
+
+def _load_record(stream: BinaryIO, engine: Engine, game_map: GameMap) -> Any:
+    return _RecordUnpickler(stream, engine, game_map).load()
+
+
+def _dtype_spec(array: np.ndarray) -> Any:
+    """Return something np.dtype() can rebuild the dtype of this array from, without pickling NumPy objects"""
+    return array.dtype.descr if array.dtype.names else array.dtype.str
+
+
+def _get_map_array(game_map: GameMap, name: str) -> np.ndarray:
+    array = getattr(game_map, name)
+    return array.bits if name in MAP_MASKS else array
+
+
+def _set_map_array(game_map: GameMap, name: str, array: np.ndarray) -> None:
+    if name in MAP_MASKS:
+        if array.dtype == bool:  # Saves from before masks were packed
+            array = BitMask.from_array(array)
+        else:
+            array = BitMask(game_map.width, game_map.height, array)
+    setattr(game_map, name, array)
+
+
+def _write_array(stream: BinaryIO, array: np.ndarray) -> None:
+    raw = array.reshape(-1, order="A").view(np.uint8)  # No copy for a contiguous array
+    for start in range(0, raw.size, CHUNK_SIZE):
+        stream.write(raw[start : start + CHUNK_SIZE].data)
+
+
+def _read_array(stream: BinaryIO, shape: tuple, dtype_spec: Any) -> np.ndarray:
+    array = np.empty(shape, dtype=np.dtype(dtype_spec), order="F")
+    raw = memoryview(array.reshape(-1, order="F").view(np.uint8))
+    position = 0
+    while position < raw.nbytes:
+        read = stream.readinto(raw[position : position + CHUNK_SIZE])
+        if not read:
+            raise EOFError("Save file ended in the middle of the map")
+        position += read
+    return array
+
+
+class SaveSnapshot:
+    """A copy of everything a save file holds, detached from the live game
+
+    Entities are already pickled and the map arrays copied, so it can be compressed and written on another thread
+    while the game carries on
+    """
+
+    def __init__(
+        self,
+        header: Dict[str, Any],
+        arrays: Dict[str, np.ndarray],
+        records: List[bytes],
+        message_batches: List[List[tuple]],
+    ):
+        self.header = header
+        self.arrays = arrays
+        self.records = records
+        self.message_batches = message_batches
+
+
+def _map_header(engine: Engine, game_map: GameMap) -> Dict[str, Any]:
+    """Return the settings of a map, and the shape/dtype of each of its arrays"""
+    arrays = {name: _get_map_array(game_map, name) for name in MAP_ARRAYS}
+    return {
+        "game_map": _public_state(
+            game_map,
+            ("engine", "entities", "actor_table", "scheduler", "width", "height")
+            + MAP_ARRAYS,
+        ),
+        "map_size": (game_map.width, game_map.height),
+        "arrays": {
+            name: (array.shape, _dtype_spec(array)) for name, array in arrays.items()
+        },
+        "entity_count": len(game_map.entities - {engine.player}),
+    }
+
+
+def _save_header(engine: Engine) -> Dict[str, Any]:
+    return {
+        "engine": _public_state(
+            engine, ("player", "game_map", "game_world", "message_log")
+        ),
+        "game_world": _public_state(engine.game_world, ("engine", "floor_store")),
+        **_map_header(engine, engine.game_map),
+        "message_count": len(engine.message_log.messages),
+        # Copies, as the header of a snapshot is pickled on another thread
+        "message_journal": {
+            "filename": engine.message_log.journal.filename,
+            "page_offsets": list(engine.message_log.journal.page_offsets),
+            "key": engine.message_log.journal.key,
+        },
+        "floor_store": {
+            "filename": engine.game_world.floor_store.filename,
+            "index": list(engine.game_world.floor_store.index.items()),
+        },
+    }
+
+
+def _entity_records(engine: Engine) -> Iterator[bytes]:
+    """Yield the pickled player, then every other entity on the map"""
+    game_map = engine.game_map
+    yield _pickle_record(engine, game_map, engine.player)
+    for entity in game_map.entities:
+        if entity is not engine.player:
+            yield _pickle_record(engine, game_map, entity)
+
+
+def _read_map(stream: BinaryIO, engine: Engine, header: Dict[str, Any]) -> GameMap:
+    """Read the arrays of a map described by `header`, without any of its entities yet"""
+    game_map = GameMap(engine, *header["map_size"])
+    # In the order they were written, where version 1 saves have "tiles" instead of a palette
+    for name, (shape, dtype_spec) in header["arrays"].items():
+        _set_map_array(game_map, name, _read_array(stream, shape, dtype_spec))
+    vars(game_map).update(header["game_map"])
+    return game_map
+
+
+def pack_floor(engine: Engine, game_map: GameMap, key: Any) -> bytes:
+    """Compress a floor the player has left, with everything on it, see FloorStore
+
+    `key` is kept with it, so unpack_floor can tell the floor apart from one of a different game
+    """
+    stream = io.BytesIO()
+    pickle.dump(
+        {"key": key, **_map_header(engine, game_map)},
+        stream,
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+    for name in MAP_ARRAYS:
+        _write_array(stream, _get_map_array(game_map, name))
+    for entity in game_map.entities:
+        stream.write(_pickle_record(engine, game_map, entity))
+    return zlib.compress(stream.getbuffer(), COMPRESS_LEVEL)
+
+
+def unpack_floor(engine: Engine, data: bytes, key: Any) -> Optional[GameMap]:
+    """Rebuild a floor compressed by pack_floor, or return None if it isn't the floor `key` was packed with"""
+    try:
+        stream = io.BytesIO(zlib.decompress(data))
+        header = pickle.load(stream)
+    except (zlib.error, pickle.UnpicklingError, EOFError):
+        return None  # Such as the store being overwritten by a newer game
+    if not isinstance(header, dict) or header.get("key") != key:
+        return None
+
+    game_map = _read_map(stream, engine, header)
+    for _ in range(header["entity_count"]):
+        game_map.add_entity(_load_record(stream, engine, game_map))
+    return game_map
+
+
+def _message_batches(messages: List[Message]) -> Iterator[List[tuple]]:
+    for start in range(0, len(messages), MESSAGE_BATCH_SIZE):
+        yield [
+            (message.plain_text, message.fg, message.count)
+            for message in messages[start : start + MESSAGE_BATCH_SIZE]
+        ]
+
+
+def _write_save_file(
+    filename: str,
+    header: Dict[str, Any],
+    arrays: Dict[str, np.ndarray],
+    records: Iterable[bytes],
+    message_batches: Iterable[List[tuple]],
+) -> None:
+    """Write a save file next to the real one, then rename it over the top so a save is never half written"""
+    temp_filename = f"{filename}.tmp"
+    with open(temp_filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, SAVE_VERSION))
+        with gzip.GzipFile(
+            fileobj=f, mode="wb", compresslevel=COMPRESS_LEVEL
+        ) as stream:
+            pickle.dump(header, stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+            for name in MAP_ARRAYS:
+                _write_array(stream, arrays[name])
+
+            for record in records:
+                stream.write(record)
+
+            for batch in message_batches:
+                pickle.dump(batch, stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(temp_filename, filename)
+
+
+def side_filename(filename: str, extension: str) -> str:
+    """Return the name of a file kept alongside a save, such as into_the_dark.journal for into_the_dark.sav"""
+    return os.path.splitext(filename)[0] + extension
+
+
+def _keep_side_files(engine: Engine, filename: str) -> None:
+    """Move the files the game keeps outside its save to go with the save, before the save refers to them
+
+    Only files this game created are written to, so saving never touches the files of a save it isn't replacing
+    """
+    engine.message_log.journal.move_to(side_filename(filename, JOURNAL_EXTENSION))
+    engine.game_world.floor_store.move_to(
+        side_filename(filename, FLOOR_STORE_EXTENSION)
+    )
+
+
+def take_snapshot(engine: Engine, filename: str) -> SaveSnapshot:
+    """Copy what's needed to save the given Engine to a file, which should be between turns"""
+    _keep_side_files(engine, filename)
+    return SaveSnapshot(
+        header=_save_header(engine),
+        arrays={
+            name: _get_map_array(engine.game_map, name).copy(order="F")
+            for name in MAP_ARRAYS
+        },
+        records=list(_entity_records(engine)),
+        message_batches=list(_message_batches(engine.message_log.messages)),
+    )
+
+
+def write_snapshot(snapshot: SaveSnapshot, filename: str) -> None:
+    """Write a previously taken snapshot to a save file, safe to call from another thread"""
+    _write_save_file(
+        filename,
+        snapshot.header,
+        snapshot.arrays,
+        snapshot.records,
+        snapshot.message_batches,
+    )
+
+
+def save_engine(engine: Engine, filename: str) -> None:
+    """Write the given Engine to a save file, streaming it straight from the live game"""
+    _keep_side_files(engine, filename)
+    _write_save_file(
+        filename,
+        _save_header(engine),
+        {name: _get_map_array(engine.game_map, name) for name in MAP_ARRAYS},
+        _entity_records(engine),
+        _message_batches(engine.message_log.messages),
+    )
+
+
+def _upgrade_legacy_engine(legacy_engine: Engine) -> Engine:
+    """Rebuild an Engine unpickled from an old save, so it has everything newer code expects"""
+    engine = Engine(player=legacy_engine.player)
+    vars(engine).update(
+        _public_state(
+            legacy_engine, ("player", "game_map", "game_world", "message_log")
+        )
+    )
+    for message in legacy_engine.message_log.messages:
+        engine.message_log.append(message)
+    engine.game_world = GameWorld(engine=engine)
+    vars(engine.game_world).update(_public_state(legacy_engine.game_world, ("engine",)))
+
+    legacy_map = legacy_engine.game_map
+    game_map = GameMap(engine, legacy_map.width, legacy_map.height)
+    vars(game_map).update(
+        _public_state(legacy_map, ("engine", "entities", "tiles") + MAP_MASKS)
+    )
+    game_map.tiles = vars(legacy_map)["tiles"]  # Hidden behind the property now
+    for name in MAP_MASKS:
+        _set_map_array(game_map, name, getattr(legacy_map, name))
+    engine.game_map = game_map
+    for entity in legacy_map.entities:
+        if isinstance(entity, Actor):
+            vars(entity).setdefault("speed", general.NORMAL_SPEED)
+        entity.parent = game_map
+        game_map.add_entity(entity)
+    _find_upstairs(game_map)
+
+    return engine
+
+
+def _find_upstairs(game_map: GameMap) -> None:
+    """Set where the stairs up are on a map from a save that didn't keep track of them"""
+    for entity in game_map.entities:
+        if entity.name == "Stairs up":
+            game_map.upstairs_location = (entity.x, entity.y)
+
+
+def load_engine(filename: str) -> Engine:
+    """Read an Engine from a save file"""
+    with open(filename, "rb") as f:
+        header_bytes = f.read(HEADER.size)
+
+        if header_bytes.startswith(LEGACY_LZMA_MAGIC):
+            legacy_engine = pickle.loads(lzma.decompress(header_bytes + f.read()))
+            assert isinstance(legacy_engine, Engine)
+            return _upgrade_legacy_engine(legacy_engine)
+
+        if len(header_bytes) < HEADER.size:
+            raise EOFError("Save file is empty or truncated")
+        magic, version = HEADER.unpack(header_bytes)
+        if magic != MAGIC:
+            raise pickle.UnpicklingError("Not an Into the Dark save file")
+        if version > SAVE_VERSION:
+            raise UnsupportedSaveVersion(
+                f"Save file version {version} is newer than this game supports ({SAVE_VERSION})"
+            )
+
+        with gzip.GzipFile(fileobj=f, mode="rb") as stream:
+            header = pickle.load(stream)
+
+            engine = Engine(player=None)
+            vars(engine).update(header["engine"])
+            engine.game_world = GameWorld(engine=engine)
+            vars(engine.game_world).update(header["game_world"])
+            if "creation_id" not in header["game_world"]:
+                # Saves from before games had a creation id don't have one, so their key is just the seed
+                engine.game_world.creation_id = None
+
+            game_map = _read_map(stream, engine, header)
+            engine.game_map = game_map
+
+            engine.player = _load_record(stream, engine, game_map)
+            game_map.add_entity(engine.player)
+            for _ in range(header["entity_count"]):
+                entity: Entity = _load_record(stream, engine, game_map)
+                game_map.add_entity(entity)
+            if "upstairs_location" not in header["game_map"]:
+                _find_upstairs(game_map)
+
+            # Saves from before floors were kept don't have a floor store
+            if "floor_store" in header:
+                engine.game_world.floor_store = FloorStore(**header["floor_store"])
+
+            # Saves from before the journal existed don't have one, only the recent messages
+            if "message_journal" in header:
+                engine.message_log.journal = MessageJournal(**header["message_journal"])
+            loaded = 0
+            while loaded < header["message_count"]:
+                for text, fg, count in pickle.load(stream):
+                    message = Message(text, fg)
+                    message.count = count
+                    engine.message_log.append(message)
+                    loaded += 1
+
+    return engine
@@ -0,0 +1,100 @@
+"""Decides which monsters act, and in what order, based on their speed"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+from typing import Dict, List, Set, TYPE_CHECKING
+
+import exceptions
+from constants import general
+
+if TYPE_CHECKING:
+    from entity import Actor
+
+
+def action_delay(speed: int) -> int:
+    """Return how many ticks an actor with the given speed waits between actions"""
+    return general.TURN_TICKS * general.NORMAL_SPEED // max(1, speed)
+
+
+class TurnScheduler:
+    """A priority queue of the actors on a map that act by themselves, ordered by when they next get to act
+
+    Time is measured in ticks, and an actor at normal speed acts once every TURN_TICKS
+    The player isn't scheduled, instead each of their actions advances the clock by their own delay
+
+    Actors whose AI has nothing to do are kept aside as dormant, and cost nothing until they're woken up
+    by the player's FOV or a noise, see GameMap.wake_actors
+    """
+
+    def __init__(self) -> None:
+        self.time = 0
+        # Entries are [time, order added, actor], with the actor set to None when it's removed
+        self._queue: List[list] = []
+        self._entries: Dict[Actor, list] = {}
+        self._counter = itertools.count()
+        self._dormant: Set[Actor] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._dormant)
+
+    def __contains__(self, actor: Actor) -> bool:
+        return actor in self._entries or actor in self._dormant
+
+    @property
+    def active_count(self) -> int:
+        return len(self._entries)
+
+    def is_dormant(self, actor: Actor) -> bool:
+        return actor in self._dormant
+
+    def add(self, actor: Actor, dormant: bool = False) -> None:
+        """Schedule an actor to act once it has waited as long as its speed requires, or set it aside as dormant"""
+        if dormant:
+            self._dormant.add(actor)
+        else:
+            self._push(actor, self.time + action_delay(actor.speed))
+
+    def remove(self, actor: Actor) -> None:
+        """Stop an actor from acting, such as when it dies or leaves the map"""
+        self._dormant.discard(actor)
+        entry = self._entries.pop(actor, None)
+        if entry:
+            entry[-1] = None  # Left in the queue, and skipped when it comes up
+
+    def wake(self, actor: Actor) -> None:
+        """Start scheduling a dormant actor again, does nothing if it's already active"""
+        if actor in self._dormant:
+            self._dormant.remove(actor)
+            self._push(actor, self.time + action_delay(actor.speed))
+
+    def _push(self, actor: Actor, time: int) -> None:
+        entry = [time, next(self._counter), actor]
+        self._entries[actor] = entry
+        heapq.heappush(self._queue, entry)
+
+    def run_turn(self, ticks: int) -> None:
+        """Advance the clock by the given number of ticks, letting every actor that's due act in order"""
+        self.time += ticks
+        queue = self._queue
+        while queue and queue[0][0] <= self.time:
+            entry = heapq.heappop(queue)
+            actor = entry[-1]
+            if actor is None:
+                continue
+
+            try:
+                actor.ai.perform()
+            except exceptions.ImpossibleAction:
+                # AI can get away with annnnything these days! So ignore it
+                # Routine failures like bumping into a wall don't get here at all, see Action.try_perform
+                pass
+
+            # Don't bring it back if it died or left the map while acting
+            if self._entries.get(actor) is entry:
+                if actor.ai.is_idle():
+                    del self._entries[actor]
+                    self._dormant.add(actor)
+                else:
+                    self._push(actor, entry[0] + action_delay(actor.speed))
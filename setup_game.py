@@ -2,38 +2,44 @@
 
 from __future__ import annotations
 
-import copy
-import lzma
-import pickle
 import random
 import traceback
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 import tcod
 from tcod import libtcodpy
 
 import entity_factory
 import input_handlers
+import savefile
 from constants import colors, general
 from engine import Engine
 from game_map import GameWorld
 
+if TYPE_CHECKING:
+    from recorder import Recorder
+
 # Load the background image and remove the alpha channel.
 background_image = tcod.image.load("assets/menu_background.png")[:, :, :3]
 
 
-def new_game() -> Engine:
-    """Return a brand new game session as an Engine instance"""
-    player = copy.deepcopy(entity_factory.player)
+def new_game(seed: Optional[int] = None) -> Engine:
+    """Return a brand new game session as an Engine instance
+
+    Everything random in a game comes from the random module, so seeding it means the same input plays out the same
+    """
+    if seed is not None:
+        random.seed(seed)
+    player = entity_factory.player.instantiate()
     engine = Engine(player=player)
 
     # Assign our default equipment
-    dagger = copy.deepcopy(entity_factory.dagger)
+    dagger = entity_factory.dagger.instantiate()
     dagger.parent = player.inventory
     player.inventory.items.append(dagger)
     player.equipment.toggle_equip(dagger, add_message=False)
 
-    vestments = copy.deepcopy(entity_factory.vestments)
+    vestments = entity_factory.vestments.instantiate()
     vestments.parent = player.inventory
     player.inventory.items.append(vestments)
     player.equipment.toggle_equip(vestments, add_message=False)
@@ -44,22 +50,26 @@ def new_game() -> Engine:
     )
 
     engine.game_world = GameWorld(engine=engine)
-    engine.game_world.generate_floor()
+    engine.message_log.journal.key = engine.game_world.game_key
+    engine.game_world.go_to_floor(1)
 
     return engine
 
 
 def load_game(filename: str) -> Engine:
     """Load an Engine instance from a file"""
-    with open(filename, "rb") as f:
-        engine = pickle.loads(lzma.decompress(f.read()))
-    assert isinstance(engine, Engine)
+    engine = savefile.load_engine(filename)
+    engine.game_world.prefetch_next_floor()
     return engine
 
 
 class MainMenu(input_handlers.BaseEventHandler):
     """Handle the main menu rendering and input"""
 
+    def __init__(self, recorder: Optional[Recorder] = None):
+        # Records a new game from its seed, if given
+        self.recorder = recorder
+
     def on_render(
         self, console: tcod.console.Console, context: tcod.context.Context
     ) -> None:
@@ -133,6 +143,9 @@ class MainMenu(input_handlers.BaseEventHandler):
                 traceback.print_exc()  # Print to stderr
                 return input_handlers.PopupMessage(self, f"Failed to load save:\n{exc}")
         elif event.sym == tcod.event.KeySym.N:
-            return input_handlers.MainGameEventHandler(new_game())
+            seed = random.getrandbits(64)
+            if self.recorder:
+                self.recorder.start(seed)
+            return input_handlers.MainGameEventHandler(new_game(seed))
 
         return None
@@ -74,6 +74,14 @@ def make_wall(
 floor = make_floor()
 wall = make_wall()
 
+# A map stores a small id per tile, which indexes into its palette of the tile types above
+WALL, FLOOR, DOWN_STAIRS = range(3)
+
+
+def make_palette() -> np.ndarray:
+    """Return the current tile types as a palette, indexed by tile id"""
+    return np.array([wall, floor, down_stairs], dtype=tile_dt)
+
 
 def generate_tiles():
     global floor, wall